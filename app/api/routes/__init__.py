@@ -2,11 +2,13 @@ from fastapi import APIRouter
 
 from app.api.routes import (
     actions,
+    attendance,
     auth,
     expense,
     group,
     group_task,
     location,
+    metrics,
     task,
     user,
 )
@@ -21,3 +23,5 @@ router.include_router(task.router)
 router.include_router(user.router)
 router.include_router(group_task.router)
 router.include_router(actions.router)
+router.include_router(attendance.router)
+router.include_router(metrics.router)
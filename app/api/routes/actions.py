@@ -1,14 +1,17 @@
-from datetime import datetime
+from datetime import UTC, datetime
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from tortoise.exceptions import DoesNotExist
+from tortoise.queryset import QuerySet
 
 from app.models import Action, Action_Pydantic
 from app.models.location import Location
 from app.models.user import User
+from app.utils.action_index import claim_action
 from app.utils.auth import get_current_user
+from app.utils.scheduler import scheduler
 
 router = APIRouter(prefix="/actions", tags=["actions"])
 
@@ -20,6 +23,16 @@ class CreateAction(BaseModel):
     end_time: datetime
 
 
+def open_action_query(user_id: int, location_id: int, at: datetime) -> QuerySet[Action]:
+    return Action.filter(
+        user_id=user_id,
+        location_id=location_id,
+        used=False,
+        start_time__lte=at,
+        end_time__gte=at,
+    )
+
+
 # Route to create a new action
 @router.post("/new", response_model=Action_Pydantic)
 async def create_action(
@@ -47,39 +60,21 @@ async def create_action(
 async def view_actions(
     location_id: int, current_user: User = Depends(get_current_user)
 ):
-    current_time = datetime.now()
-
-    actions = await Action.filter(
-        user=current_user,
-        location__id=location_id,
-        start_time__lte=current_time,
-        end_time__gte=current_time,
-        used=False,
-    )
-
+    # The database, not this worker's action_index: actions created through
+    # another worker only reach that worker's index
+    actions = await open_action_query(current_user.id, location_id, datetime.now(UTC))
     return actions
 
 
 # Route to trigger a task
 @router.get("/trigger/{trigger}")
 async def trigger_action(trigger: int, current_user: User = Depends(get_current_user)):
-    current_time = datetime.now()
-    action = await Action.get_or_none(
-        user=current_user,
-        id=trigger,
-        start_time__lte=current_time,
-        end_time__gte=current_time,
-        used=False,
-    )
-
-    if not action:
+    if not await claim_action(trigger, user_id=current_user.id):
         raise HTTPException(status_code=404, detail="Trigger not found or already used")
 
-    # Set action as used
-    action.used = True
-    await action.save()
+    action = await Action.get(id=trigger)
+    await scheduler.dispatch(action.id)
 
-    # Execute the trigger (placeholder logic, add actual logic here)
     return {
         "message": action.trigger_function,
         "action": await Action_Pydantic.from_tortoise_orm(action),
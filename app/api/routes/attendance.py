@@ -0,0 +1,79 @@
+from datetime import date, datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from tortoise.queryset import ValuesQuery
+
+from app.models import AttendanceRollup, User
+from app.utils.auth import get_current_user
+from app.utils.memberships import Memberships, get_memberships
+from app.utils.replica import read_replica
+from app.utils.responses import RowList
+from app.utils.rows import fetch_rows
+
+router = APIRouter(prefix="/attendance", tags=["attendance"])
+
+MAX_REPORT_DAYS = 366
+
+
+class RollupInfo(BaseModel):
+    user_id: int
+    username: str
+    day: date
+    first_in: Optional[datetime]
+    last_out: Optional[datetime]
+    dwell_seconds: int
+    inside_since: Optional[datetime]
+
+
+ROLLUP_ROWS = RowList(RollupInfo)
+
+
+def report_query(
+    start: date, end: date, user_id: Optional[int], group_id: Optional[int]
+) -> ValuesQuery:
+    """One user's rollups, or those of a group's members when group_id is set"""
+    query = AttendanceRollup.filter(day__gte=start, day__lte=end)
+    if group_id is None:
+        query = query.filter(user_id=user_id)
+    else:
+        query = query.filter(user__group_memberships__group_id=group_id)
+    return query.order_by("day", "user_id").values(
+        "user_id",
+        "day",
+        "first_in",
+        "last_out",
+        "dwell_seconds",
+        "inside_since",
+        username="user__username",
+    )
+
+
+@router.get(
+    "/report",
+    response_model=List[RollupInfo],
+    dependencies=[Depends(read_replica)],
+)
+async def attendance_report(
+    start: date,
+    end: date,
+    group_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships),
+):
+    """Daily time spent in office, for yourself or a group you administer"""
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end - start).days >= MAX_REPORT_DAYS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_REPORT_DAYS} days per report"
+        )
+
+    if group_id is not None and not memberships.is_admin(group_id):
+        raise HTTPException(
+            status_code=403, detail="Only admins can view group attendance"
+        )
+
+    rows = await fetch_rows(report_query(start, end, current_user.id, group_id))
+    return ROLLUP_ROWS.response(rows)
@@ -4,7 +4,12 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr, field_validator
 
 from app.models.user import User, User_Pydantic
-from app.utils.auth import create_access_token, get_password_hash, verify_password
+from app.utils.auth import (
+    create_access_token,
+    get_password_hash,
+    user_query,
+    verify_password,
+)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -49,7 +54,7 @@ async def signup(user: UserSignup):
     if await User.exists(email=user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
 
     user_obj = await User.create(
         username=user.username,
@@ -64,13 +69,13 @@ async def signup(user: UserSignup):
 
 @router.post("/login", response_model=Token)
 async def login(user_login: UserLogin):
-    user = await User.get_or_none(username=user_login.username)
+    user = await user_query(user_login.username)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
-    if not verify_password(user_login.password, user.password):
+    if not await verify_password(user_login.password, user.password):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
-    access_token = create_access_token(data={"sub": user.username})
+    access_token = create_access_token(data={"sub": user.username, "uid": user.id})
 
     return Token(access_token=access_token, token_type="bearer")
@@ -1,9 +1,14 @@
+import json
+import time
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from tortoise.queryset import ValuesQuery
 
+from app.config import config
 from app.models import (
     Group,
     Group_Pydantic,
@@ -13,6 +18,24 @@ from app.models import (
     User,
 )
 from app.utils.auth import get_current_user
+from app.utils.memberships import (
+    Memberships,
+    get_memberships,
+    invalidate_group,
+    invalidate_memberships,
+    is_member,
+)
+from app.utils.pagination import (
+    Keyset,
+    decode_cursor,
+    encode_cursor,
+    page_limit,
+    parse_datetime,
+)
+from app.utils.pubsub import broker, group_topic, publish_group
+from app.utils.replica import read_replica
+from app.utils.responses import RowList
+from app.utils.rows import fetch_rows
 
 
 # Updated Response Models
@@ -33,17 +56,43 @@ class MemberInfo(BaseModel):
     user_username: str
 
 
-class GroupWithMembers(BaseModel):
+class GroupInfo(BaseModel):
     id: int
     name: str
     description: Optional[str]
     created_at: datetime
     updated_at: datetime
+
+
+class GroupWithMembers(GroupInfo):
     members: List[MemberInfo]
+    next_cursor: Optional[str] = None
 
 
 router = APIRouter(prefix="/group", tags=["group"])
 
+GROUP_PAGES = Keyset("created_at", descending=True, parse=parse_datetime)
+GROUP_ROWS = RowList(Group_Pydantic)
+
+
+def group_page_query(user_id: int, cursor: Optional[str], limit: int) -> ValuesQuery:
+    return GROUP_PAGES.query(
+        Group.filter(memberships__user_id=user_id),
+        Group_Pydantic.model_fields,
+        cursor,
+        limit,
+    )
+
+
+def admin_group_query(user_id: int) -> ValuesQuery:
+    return (
+        Group.filter(
+            memberships__user_id=user_id, memberships__role=MembershipRole.ADMIN
+        )
+        .order_by("-created_at")
+        .values(*Group_Pydantic.model_fields)
+    )
+
 
 # Request Models
 class GroupCreate(BaseModel):
@@ -61,16 +110,11 @@ class MemberAdd(BaseModel):
     role: MembershipRole = MembershipRole.MEMBER
 
 
-# Helper function to check admin status
-async def is_group_admin(user: User, group_id: int) -> bool:
-    return await GroupMembership.exists(
-        group_id=group_id, user_id=user.id, role=MembershipRole.ADMIN
-    )
-
-
 @router.get("/{group_id}/is_admin")
-async def check_is_admin(group_id: int, user: User = Depends(get_current_user)) -> bool:
-    return await is_group_admin(user, group_id)
+async def check_is_admin(
+    group_id: int, memberships: Memberships = Depends(get_memberships)
+) -> bool:
+    return memberships.is_admin(group_id)
 
 
 # Routes
@@ -92,69 +136,185 @@ async def create_group(
     return await Group_Pydantic.from_tortoise_orm(group)
 
 
-@router.get("/list", response_model=List[Group_Pydantic])
-async def list_user_groups(current_user: User = Depends(get_current_user)):
-    """List all groups user is a member of"""
-    groups = await Group_Pydantic.from_queryset(
-        Group.filter(members=current_user).order_by("-created_at")
+@router.get(
+    "/list",
+    response_model=List[Group_Pydantic],
+    dependencies=[Depends(read_replica)],
+)
+async def list_user_groups(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_limit),
+    current_user: User = Depends(get_current_user),
+):
+    """List groups user is a member of, newest first, cursor in X-Next-Cursor"""
+    rows = await GROUP_PAGES.fetch(
+        group_page_query(current_user.id, cursor, limit), limit, response
     )
-    return groups
+    return GROUP_ROWS.response(rows, response)
 
 
-@router.get("/admin", response_model=List[Group_Pydantic])
+@router.get(
+    "/admin",
+    response_model=List[Group_Pydantic],
+    dependencies=[Depends(read_replica)],
+)
 async def list_admin_groups(current_user: User = Depends(get_current_user)):
     """List groups where user is admin"""
-    groups = await Group_Pydantic.from_queryset(
-        Group.filter(
-            memberships__user=current_user, memberships__role=MembershipRole.ADMIN
-        ).order_by("-created_at")
-    )
-    return groups
+    rows = await fetch_rows(admin_group_query(current_user.id))
+    return GROUP_ROWS.response(rows)
 
 
-@router.get("/{group_id}", response_model=GroupWithMembers)
-async def get_group_details(
-    group_id: int, current_user: User = Depends(get_current_user)
+def _ends_stream(message: dict, user_id: int) -> bool:
+    """Whether a group event takes away the listener's access to the group"""
+    data = message["data"]
+    if message["type"] == "group":
+        return data.get("change") == "deleted"
+    if message["type"] == "member":
+        return data.get("change") == "removed" and data.get("user_id") == user_id
+    return False
+
+
+@router.get("/{group_id}/stream")
+async def stream_group_events(
+    group_id: int, memberships: Memberships = Depends(get_memberships)
 ):
-    """Get detailed group information including members"""
-    # Check if user is member of the group
-    membership = await GroupMembership.exists(group_id=group_id, user=current_user)
-    if not membership:
+    """Server-Sent Events feed of member transitions and task changes"""
+    if not memberships.is_member(group_id):
         raise HTTPException(
             status_code=403, detail="You are not a member of this group"
         )
 
-    # Get group with all necessary related data
-    group = await Group.get_or_none(id=group_id).prefetch_related("memberships__user")
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
+    user_id = memberships.user.id
+    subscription = broker.subscribe(group_topic(group_id))
+
+    async def events():
+        checked = time.monotonic()
+        try:
+            while True:
+                if time.monotonic() - checked >= config.stream_heartbeat_seconds:
+                    # In case the event that ended the membership was dropped
+                    if not await is_member(group_id, user_id):
+                        return
+                    checked = time.monotonic()
+                message = await subscription.get(config.stream_heartbeat_seconds)
+                if message is None:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {message['type']}\ndata: {json.dumps(message['data'])}\n\n"
+                if _ends_stream(message, user_id):
+                    return
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+MEMBER_COLUMNS = {
+    "user_name": "user__name",
+    "user_username": "user__username",
+    "group_name": "group__name",
+    "group_description": "group__description",
+    "group_created_at": "group__created_at",
+    "group_updated_at": "group__updated_at",
+}
+
+
+def member_page_query(group_id: int, after: Optional[int], limit: int) -> ValuesQuery:
+    """Members after a membership id, each row joined with its user and group"""
+    query = GroupMembership.filter(group_id=group_id)
+    if after is not None:
+        query = query.filter(id__gt=after)
+    return (
+        query.order_by("id")
+        .limit(limit)
+        .values("id", "user_id", "role", "joined_at", "invited_by_id", **MEMBER_COLUMNS)
+    )
+
 
-    # Get memberships data with user information
-    memberships = (
-        await GroupMembership.filter(group_id=group_id)
-        .prefetch_related("user")
-        .values(
-            "id",
-            "user_id",
-            "role",
-            "joined_at",
-            "invited_by_id",
-            user_name="user__name",
-            user_username="user__username",
+async def _group_info(group_id: int, rows: List[dict]) -> GroupInfo:
+    if rows:
+        row = rows[0]
+        return GroupInfo(
+            id=group_id,
+            name=row["group_name"],
+            description=row["group_description"],
+            created_at=row["group_created_at"],
+            updated_at=row["group_updated_at"],
         )
+    # Only a page past the last member needs the group on its own
+    group = await Group.get_or_none(id=group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return GroupInfo(
+        id=group.id,
+        name=group.name,
+        description=group.description,
+        created_at=group.created_at,
+        updated_at=group.updated_at,
     )
 
-    # Get group data and explicitly include created_by
-    group_data = {
-        "id": group.id,
-        "name": group.name,
-        "description": group.description,
-        "created_at": group.created_at,
-        "updated_at": group.updated_at,
-        "members": [MemberInfo(**membership) for membership in memberships],
-    }
 
-    return GroupWithMembers(**group_data)
+@router.get(
+    "/{group_id}",
+    response_model=GroupWithMembers,
+    dependencies=[Depends(read_replica)],
+)
+async def get_group_details(
+    group_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(config.page_size_max, ge=1, le=config.page_size_max),
+    stream: bool = False,
+    memberships: Memberships = Depends(get_memberships),
+):
+    """Get detailed group information including members
+
+    Members come in pages ordered by membership; pass `next_cursor` back as
+    `cursor` for the next one. With `stream` the group and then every
+    member from the cursor on are sent as newline-delimited JSON instead.
+    """
+    # Check if user is member of the group
+    if not memberships.is_member(group_id):
+        raise HTTPException(
+            status_code=403, detail="You are not a member of this group"
+        )
+
+    after = decode_cursor(cursor, 1)
+    after = after[0] if after else None
+    if after is not None and not isinstance(after, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # One extra row tells whether another page follows
+    rows = await member_page_query(group_id, after, limit + 1)
+    group = await _group_info(group_id, rows)
+
+    if stream:
+
+        async def lines():
+            nonlocal rows
+            yield group.model_dump_json() + "\n"
+            while True:
+                for row in rows[:limit]:
+                    yield MemberInfo(**row).model_dump_json() + "\n"
+                if len(rows) <= limit:
+                    return
+                rows = await member_page_query(
+                    group_id, rows[limit - 1]["id"], limit + 1
+                )
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    next_cursor = encode_cursor(rows[limit - 1]["id"]) if len(rows) > limit else None
+    return GroupWithMembers(
+        **group.model_dump(),
+        members=[MemberInfo(**row) for row in rows[:limit]],
+        next_cursor=next_cursor,
+    )
 
 
 @router.post("/{group_id}/member", response_model=GroupMembership_Pydantic)
@@ -162,10 +322,11 @@ async def add_member(
     group_id: int,
     member_data: MemberAdd,
     current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships),
 ):
     """Add a new member to the group"""
     # Check if user is admin
-    if not await is_group_admin(current_user, group_id):
+    if not memberships.is_admin(group_id):
         raise HTTPException(status_code=403, detail="Only admins can add members")
 
     # Check if user exists
@@ -189,17 +350,25 @@ async def add_member(
         role=member_data.role,
         invited_by=current_user,
     )
+    publish_group(
+        group_id,
+        "member",
+        {"change": "added", "user_id": new_member.id, "role": membership.role.value},
+    )
 
     return await GroupMembership_Pydantic.from_tortoise_orm(membership)
 
 
 @router.delete("/{group_id}/member/{user_id}")
 async def remove_member(
-    group_id: int, user_id: int, current_user: User = Depends(get_current_user)
+    group_id: int,
+    user_id: int,
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships),
 ):
     """Remove a member from the group"""
     # Check if user is admin
-    if not await is_group_admin(current_user, group_id):
+    if not memberships.is_admin(group_id):
         raise HTTPException(status_code=403, detail="Only admins can remove members")
 
     # Cannot remove the last admin
@@ -217,6 +386,8 @@ async def remove_member(
 
     if not deleted_count:
         raise HTTPException(status_code=404, detail="Member not found in group")
+    invalidate_memberships(user_id)
+    publish_group(group_id, "member", {"change": "removed", "user_id": user_id})
 
     return {"message": "Member removed successfully"}
 
@@ -225,11 +396,11 @@ async def remove_member(
 async def update_group(
     group_id: int,
     group_data: GroupUpdate,
-    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships),
 ):
     """Update group details"""
     # Check if user is admin
-    if not await is_group_admin(current_user, group_id):
+    if not memberships.is_admin(group_id):
         raise HTTPException(
             status_code=403, detail="Only admins can update group details"
         )
@@ -246,10 +417,12 @@ async def update_group(
 
 
 @router.delete("/{group_id}")
-async def delete_group(group_id: int, current_user: User = Depends(get_current_user)):
+async def delete_group(
+    group_id: int, memberships: Memberships = Depends(get_memberships)
+):
     """Delete a group"""
     # Check if user is admin
-    if not await is_group_admin(current_user, group_id):
+    if not memberships.is_admin(group_id):
         raise HTTPException(status_code=403, detail="Only admins can delete the group")
 
     group = await Group.get_or_none(id=group_id)
@@ -259,5 +432,7 @@ async def delete_group(group_id: int, current_user: User = Depends(get_current_u
     # Delete all memberships and the group
     await GroupMembership.filter(group_id=group_id).delete()
     await group.delete()
+    invalidate_group(group_id)
+    publish_group(group_id, "group", {"change": "deleted"})
 
     return {"message": "Group deleted successfully"}
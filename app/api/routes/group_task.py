@@ -1,16 +1,25 @@
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from pydantic import BaseModel
 from tortoise.expressions import Q
+from tortoise.queryset import ValuesQuery
 
-from app.models import Group, GroupTask_Pydantic, User
+from app.models import GroupTask_Pydantic, User
 from app.models.group_task import GroupTask
 from app.utils.auth import get_current_user
+from app.utils.memberships import Memberships, get_memberships, is_member
+from app.utils.pagination import Keyset, page_limit, parse_datetime
+from app.utils.pubsub import publish_group
+from app.utils.replica import read_replica
+from app.utils.responses import RowList
 
 router = APIRouter(prefix="/group-tasks", tags=["group-tasks"])
 
+TASK_PAGES = Keyset("created_at", descending=True, parse=parse_datetime)
+TASK_ROWS = RowList(GroupTask_Pydantic)
+
 
 class GroupTaskCreate(BaseModel):
     group_id: int
@@ -27,26 +36,27 @@ class GroupTaskUpdate(BaseModel):
     assigned_to_id: Optional[int] = None
 
 
-async def verify_group_member(group_id: int, user_id: int) -> bool:
-    group = await Group.get_or_none(id=group_id)
-    if not group:
-        return False
-    return await group.members.filter(id=user_id).exists()
+async def _publish_task(task: GroupTask, change: str):
+    data = await GroupTask_Pydantic.from_tortoise_orm(task)
+    publish_group(
+        task.group_id, "task", {"change": change, "task": data.model_dump(mode="json")}
+    )
+    return data
 
 
 # Routes
 @router.post("/new", response_model=GroupTask_Pydantic)
 async def create_group_task(
-    task: GroupTaskCreate, current_user: User = Depends(get_current_user)
+    task: GroupTaskCreate,
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships),
 ):
     """Create a new group task"""
-    if not await verify_group_member(task.group_id, current_user.id):
+    if not memberships.is_member(task.group_id):
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
     # Verify assigned user is in the group if provided
-    if task.assigned_to_id and not await verify_group_member(
-        task.group_id, task.assigned_to_id
-    ):
+    if task.assigned_to_id and not await is_member(task.group_id, task.assigned_to_id):
         raise HTTPException(
             status_code=400, detail="Assigned user is not a member of this group"
         )
@@ -59,48 +69,102 @@ async def create_group_task(
         assigned_to_id=task.assigned_to_id,
         created_by=current_user,
     )
-    return await GroupTask_Pydantic.from_tortoise_orm(task_obj)
+    return await _publish_task(task_obj, "created")
+
 
+def _task_filters(
+    completed: Optional[bool] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+) -> Q:
+    query = Q()
+    if completed is not None:
+        query &= Q(completed=completed)
+    if due_after is not None:
+        query &= Q(due_date__gte=due_after)
+    if due_before is not None:
+        query &= Q(due_date__lt=due_before)
+    return query
+
+
+def group_task_page_query(
+    group_id: int, filters: Q, cursor: Optional[str], limit: int
+) -> ValuesQuery:
+    return TASK_PAGES.query(
+        GroupTask.filter(filters, group_id=group_id),
+        GroupTask_Pydantic.model_fields,
+        cursor,
+        limit,
+    )
 
-@router.get("/view/{group_id}", response_model=List[GroupTask_Pydantic])
+
+def assigned_task_page_query(
+    user_id: int, filters: Q, cursor: Optional[str], limit: int
+) -> ValuesQuery:
+    return TASK_PAGES.query(
+        GroupTask.filter(filters, assigned_to_id=user_id),
+        GroupTask_Pydantic.model_fields,
+        cursor,
+        limit,
+    )
+
+
+@router.get(
+    "/view/{group_id}",
+    response_model=List[GroupTask_Pydantic],
+    dependencies=[Depends(read_replica)],
+)
 async def get_group_tasks(
     group_id: int,
-    current_user: User = Depends(get_current_user),
-    completed: Optional[bool] = None,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_limit),
+    filters: Q = Depends(_task_filters),
+    memberships: Memberships = Depends(get_memberships),
 ):
-    """Get all tasks for a specific group"""
-    if not await verify_group_member(group_id, current_user.id):
+    """Tasks of a group, newest first; the next page's cursor is in X-Next-Cursor"""
+    if not memberships.is_member(group_id):
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
-    query = Q(group_id=group_id)
-    if completed is not None:
-        query &= Q(completed=completed)
-
-    tasks = await GroupTask.filter(query).order_by("-created_at")
-    return [await GroupTask_Pydantic.from_tortoise_orm(task) for task in tasks]
+    rows = await TASK_PAGES.fetch(
+        group_task_page_query(group_id, filters, cursor, limit), limit, response
+    )
+    return TASK_ROWS.response(rows, response)
 
 
-@router.get("/assigned", response_model=List[GroupTask_Pydantic])
+@router.get(
+    "/assigned",
+    response_model=List[GroupTask_Pydantic],
+    dependencies=[Depends(read_replica)],
+)
 async def get_assigned_tasks(
-    current_user: User = Depends(get_current_user), completed: Optional[bool] = None
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_limit),
+    filters: Q = Depends(_task_filters),
+    current_user: User = Depends(get_current_user),
 ):
-    """Get all tasks assigned to the current user"""
-    query = Q(assigned_to_id=current_user.id)
-    if completed is not None:
-        query &= Q(completed=completed)
-
-    tasks = await GroupTask.filter(query).order_by("-created_at")
-    return [await GroupTask_Pydantic.from_tortoise_orm(task) for task in tasks]
+    """Tasks assigned to the current user, newest first, paged like /view"""
+    rows = await TASK_PAGES.fetch(
+        assigned_task_page_query(current_user.id, filters, cursor, limit),
+        limit,
+        response,
+    )
+    return TASK_ROWS.response(rows, response)
 
 
-@router.get("/{task_id}", response_model=GroupTask_Pydantic)
-async def get_task(task_id: int, current_user: User = Depends(get_current_user)):
+@router.get(
+    "/{task_id}",
+    response_model=GroupTask_Pydantic,
+    dependencies=[Depends(read_replica)],
+)
+async def get_task(task_id: int, memberships: Memberships = Depends(get_memberships)):
     """Get a specific task by ID"""
     task = await GroupTask.get_or_none(id=task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    if not await verify_group_member(task.group, current_user.id):
+    if not memberships.is_member(task.group_id):
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
     return await GroupTask_Pydantic.from_tortoise_orm(task)
@@ -110,19 +174,19 @@ async def get_task(task_id: int, current_user: User = Depends(get_current_user))
 async def update_task(
     task_id: int,
     task_update: GroupTaskUpdate,
-    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships),
 ):
     """Update a task"""
     task = await GroupTask.get_or_none(id=task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    if not await verify_group_member(task.group, current_user.id):
+    if not memberships.is_member(task.group_id):
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
     # Verify assigned user is in the group if provided
-    if task_update.assigned_to_id and not await verify_group_member(
-        task.group, task_update.assigned_to_id
+    if task_update.assigned_to_id and not await is_member(
+        task.group_id, task_update.assigned_to_id
     ):
         raise HTTPException(
             status_code=400, detail="Assigned user is not a member of this group"
@@ -130,20 +194,23 @@ async def update_task(
 
     update_data = task_update.model_dump(exclude_unset=True)
     await task.update_from_dict(update_data).save()
-    return await GroupTask_Pydantic.from_tortoise_orm(task)
+    return await _publish_task(task, "updated")
 
 
 @router.get("/toggle_complete/{task_id}", response_model=GroupTask_Pydantic)
 async def toggle_task_completion(
-    task_id: int, current_user: User = Depends(get_current_user)
+    task_id: int, memberships: Memberships = Depends(get_memberships)
 ):
     task = await GroupTask.get_or_none(id=task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
+    if not memberships.is_member(task.group_id):
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+
     task.completed = not task.completed
     await task.save()
-    return await GroupTask_Pydantic.from_tortoise_orm(task)
+    return await _publish_task(task, "toggled")
 
 
 #
@@ -168,40 +235,45 @@ async def toggle_task_completion(
 
 @router.post("/{task_id}/assign/{user_id}", response_model=GroupTask_Pydantic)
 async def assign_task(
-    task_id: int, user_id: int, current_user: User = Depends(get_current_user)
+    task_id: int, user_id: int, memberships: Memberships = Depends(get_memberships)
 ):
     """Assign a task to a specific user"""
     task = await GroupTask.get_or_none(id=task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    if not await verify_group_member(task.group, current_user.id):
+    if not memberships.is_member(task.group_id):
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
-    if not await verify_group_member(task.group, user_id):
+    if not await is_member(task.group_id, user_id):
         raise HTTPException(
             status_code=400, detail="Assigned user is not a member of this group"
         )
 
     task.assigned_to_id = user_id
     await task.save()
-    return await GroupTask_Pydantic.from_tortoise_orm(task)
+    return await _publish_task(task, "assigned")
 
 
 @router.delete("/{task_id}")
-async def delete_task(task_id: int, current_user: User = Depends(get_current_user)):
+async def delete_task(
+    task_id: int,
+    current_user: User = Depends(get_current_user),
+    memberships: Memberships = Depends(get_memberships),
+):
     """Delete a task"""
     task = await GroupTask.get_or_none(id=task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    if not await verify_group_member(task.group, current_user.id):
+    if not memberships.is_member(task.group_id):
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
-    if task.created_by != current_user:
+    if task.created_by_id != current_user.id:
         raise HTTPException(
             status_code=403, detail="Only task creator can delete the task"
         )
 
     await task.delete()
+    publish_group(task.group_id, "task", {"change": "deleted", "task": {"id": task_id}})
     return {"message": "Task deleted successfully"}
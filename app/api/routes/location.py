@@ -1,59 +1,331 @@
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from datetime import UTC, datetime, timedelta
+from typing import Annotated, List, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, field_validator
+from tortoise.queryset import QuerySetSingle, ValuesQuery
 from tortoise.transactions import atomic
 
+from app.config import config
+from app.models.attendance import AttendanceEvent
 from app.models.location import (
     Blacklist,
     Location,
     Location_Pydantic,
+    LocationPing,
     Office,
     Residence,
 )
 from app.models.user import User
+from app.utils.action_index import action_index
+from app.utils.attendance import offices_inside, update_rollups
 from app.utils.auth import get_current_user
+from app.utils.dates import as_utc
+from app.utils.geofence import (
+    FenceRoles,
+    Ping,
+    Transition,
+    evaluate_pings,
+    load_fence_roles,
+    load_position,
+    positions,
+)
+from app.utils.pagination import Keyset, page_limit
+from app.utils.pubsub import publish_group
+from app.utils.replica import read_replica
+from app.utils.responses import RowList
+from app.utils.rows import fetch_rows
+from app.utils.scheduler import scheduler
+from app.utils.writer import attendance_writer, ping_writer
 
 router = APIRouter(prefix="/location", tags=["location"])
 
+LOCATION_PAGES = Keyset()
+LOCATION_ROWS = RowList(Location_Pydantic)
+
+# Device clocks run a little fast; pings further ahead than this are rejected
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# Coarser fixes than this can't place anyone inside a fence
+MAX_ACCURACY_METERS = 10_000
+# Generous for one JSON ping; bounds a batch body before anything is parsed
+MAX_PING_BYTES = 512
+
+Latitude = Annotated[float, Field(ge=-90, le=90)]
+Longitude = Annotated[float, Field(ge=-180, le=180)]
+
 
 class LocationInput(BaseModel):
     address: str
+    latitude: Latitude
+    longitude: Longitude
+    location_type: str
+
+
+class PingInput(BaseModel):
+    latitude: Latitude
+    longitude: Longitude
+    accuracy: float = Field(0, ge=0, le=MAX_ACCURACY_METERS)  # meters
+    timestamp: Optional[datetime] = None
+
+    @field_validator("timestamp")
+    @classmethod
+    def not_in_future(cls, v):
+        # One future ping would become the user's latest position and every
+        # real ping after it would be dropped as out of order
+        if v is not None and as_utc(v) > datetime.now(UTC) + MAX_CLOCK_SKEW:
+            raise ValueError("Timestamp is ahead of server time")
+        return v
+
+
+class FenceInfo(BaseModel):
+    kind: str
+    id: int
     latitude: float
     longitude: float
-    location_type: str
+    radius: float
+
+
+class TransitionInfo(BaseModel):
+    kind: str
+    id: int
+    event: str
+    timestamp: datetime
+
+
+class PingResult(BaseModel):
+    inside: List[FenceInfo]
+    transitions: List[TransitionInfo]
+    # Unused actions open right now at a location the user is inside
+    actions: List[int]
+
+
+class BatchPingResult(PingResult):
+    received: int
 
 
-@router.get("/view/all")
-async def view_all_addresses(current_user: User = Depends(get_current_user)):
-    locations = await Location_Pydantic.from_queryset(
-        Location.filter(user=current_user)
+_ping_list = TypeAdapter(List[PingInput])
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"At most {config.ping_batch_max} pings per batch",
     )
-    return locations
 
 
-@router.get("/view/residence")
+async def _read_batch(request: Request) -> bytes:
+    """The request body, refused as soon as it can't fit a full batch"""
+    limit = config.ping_batch_max * MAX_PING_BYTES
+    if int(request.headers.get("content-length") or 0) > limit:
+        raise _too_large()
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise _too_large()
+    return bytes(body)
+
+
+def _validation_error(errors: list) -> HTTPException:
+    return HTTPException(status_code=422, detail=errors)
+
+
+def _parse_ndjson(body: bytes) -> List[PingInput]:
+    lines = [line for line in body.splitlines() if line.strip()]
+    if len(lines) > config.ping_batch_max:
+        raise _too_large()
+    inputs, errors = [], []
+    for i, line in enumerate(lines):
+        try:
+            inputs.append(PingInput.model_validate_json(line))
+        except ValidationError as e:
+            # Located like the items of a JSON array, by position in the batch
+            errors.extend(
+                {**error, "loc": (i, *error["loc"])}
+                for error in e.errors(include_url=False, include_context=False)
+            )
+    if errors:
+        raise _validation_error(errors)
+    return inputs
+
+
+def _parse_json(body: bytes) -> List[PingInput]:
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise _validation_error(
+            [{"type": "json_invalid", "loc": (), "msg": f"Invalid JSON: {e}"}]
+        )
+    if isinstance(data, list) and len(data) > config.ping_batch_max:
+        raise _too_large()
+    try:
+        return _ping_list.validate_python(data)
+    except ValidationError as e:
+        raise _validation_error(e.errors(include_url=False, include_context=False))
+
+
+def _to_ping(ping: PingInput) -> Ping:
+    now = datetime.now(UTC)
+    # Within the allowed skew, clamp so the next ping is not out of order
+    timestamp = min(as_utc(ping.timestamp), now) if ping.timestamp else now
+    return Ping(ping.latitude, ping.longitude, ping.accuracy, timestamp)
+
+
+def _record(user_id: int, pings: List[Ping], transitions: List[Transition]) -> None:
+    # Buffered, the writers bulk insert in the background
+    ping_writer.extend(
+        LocationPing(
+            user_id=user_id,
+            latitude=ping.latitude,
+            longitude=ping.longitude,
+            accuracy=ping.accuracy,
+            recorded_at=ping.timestamp,
+        )
+        for ping in pings
+    )
+    attendance_writer.extend(
+        AttendanceEvent(
+            user_id=user_id,
+            fence_kind=t.fence.kind,
+            fence_id=t.fence.id,
+            event=t.event,
+            timestamp=t.timestamp,
+        )
+        for t in transitions
+    )
+
+
+def _fire_entered(user_id: int, transitions: List[Transition]) -> None:
+    scheduler.notify_enter(
+        user_id,
+        {
+            t.fence.id
+            for t in transitions
+            if t.event == "enter" and t.fence.kind != "event"
+        },
+    )
+
+
+# Place transitions other group members may see; home and blacklisted
+# places stay private
+SHARED_PLACE_KINDS = {"location", "office"}
+
+
+def _publish_transitions(
+    user_id: int, roles: FenceRoles, transitions: List[Transition]
+) -> None:
+    private = roles.residence_ids | roles.blacklist_ids
+    for t in transitions:
+        if t.fence.kind != "event" and (
+            t.fence.kind not in SHARED_PLACE_KINDS or t.fence.id in private
+        ):
+            # A residence is also one of the user's own "location" fences
+            continue
+        data = {
+            "user_id": user_id,
+            "kind": t.fence.kind,
+            "id": t.fence.id,
+            "event": t.event,
+            "timestamp": t.timestamp.isoformat(),
+        }
+        # Event fences concern their own group, places concern all of them
+        group_ids = [t.fence.owner_id] if t.fence.kind == "event" else roles.group_ids
+        for group_id in group_ids:
+            publish_group(group_id, "transition", data)
+
+
+def _ping_result(user_id: int, transitions: List[Transition]) -> dict:
+    position = positions.get(user_id)
+    inside = position.inside.values() if position is not None else []
+    location_ids = {fence.id for fence in inside if fence.kind != "event"}
+    return {
+        "inside": [
+            FenceInfo(
+                kind=fence.kind,
+                id=fence.id,
+                latitude=fence.latitude,
+                longitude=fence.longitude,
+                radius=fence.radius,
+            )
+            for fence in inside
+        ],
+        "transitions": [
+            TransitionInfo(
+                kind=t.fence.kind, id=t.fence.id, event=t.event, timestamp=t.timestamp
+            )
+            for t in transitions
+        ],
+        "actions": [
+            action_id
+            for location_id in location_ids
+            for action_id in action_index.open_actions(user_id, location_id)
+        ],
+    }
+
+
+def location_page_query(
+    user_id: int, location_type: Optional[str], cursor: Optional[str], limit: int
+) -> ValuesQuery:
+    query = Location.filter(user_id=user_id)
+    if location_type is not None:
+        query = query.filter(location_type=location_type)
+    return LOCATION_PAGES.query(query, Location_Pydantic.model_fields, cursor, limit)
+
+
+def residence_query(user_id: int) -> QuerySetSingle[Optional[Location]]:
+    return Location.get_or_none(residence_location__user_id=user_id)
+
+
+def office_query(user_id: int) -> QuerySetSingle[Optional[Location]]:
+    return Location.get_or_none(office_location__user_id=user_id)
+
+
+def blacklist_query(user_id: int) -> ValuesQuery:
+    return Location.filter(blacklisted_location__user_id=user_id).values(
+        *Location_Pydantic.model_fields
+    )
+
+
+@router.get(
+    "/view/all",
+    response_model=List[Location_Pydantic],
+    dependencies=[Depends(read_replica)],
+)
+async def view_all_addresses(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_limit),
+    location_type: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+):
+    query = location_page_query(current_user.id, location_type, cursor, limit)
+    rows = await LOCATION_PAGES.fetch(query, limit, response)
+    return LOCATION_ROWS.response(rows, response)
+
+
+@router.get("/view/residence", dependencies=[Depends(read_replica)])
 async def view_residence(current_user: User = Depends(get_current_user)):
-    residence = await Location.get_or_none(residence_location__user=current_user)
+    residence = await residence_query(current_user.id)
     if not residence:
         raise HTTPException(status_code=404, detail="Residence not assigned")
 
     return await Location_Pydantic.from_tortoise_orm(residence)
 
 
-@router.get("/view/office")
+@router.get("/view/office", dependencies=[Depends(read_replica)])
 async def view_office(current_user: User = Depends(get_current_user)):
-    office = await Location.get_or_none(office_location__user=current_user)
+    office = await office_query(current_user.id)
     if not office:
         raise HTTPException(status_code=404, detail="Residence not assigned")
 
     return await Location_Pydantic.from_tortoise_orm(office)
 
 
-@router.get("/view/blacklist")
+@router.get("/view/blacklist", dependencies=[Depends(read_replica)])
 async def view_blacklist(current_user: User = Depends(get_current_user)):
-    blacklisted = await Location_Pydantic.from_queryset(
-        Location.filter(blacklisted_location__user=current_user)
-    )
-    return blacklisted
+    rows = await fetch_rows(blacklist_query(current_user.id))
+    return LOCATION_ROWS.response(rows)
 
 
 @atomic()
@@ -121,3 +393,66 @@ async def create_new_address(
         user=current_user,
     )
     return location
+
+
+@router.post("/ping", response_model=PingResult)
+async def location_ping(
+    ping: PingInput, current_user: User = Depends(get_current_user)
+):
+    """Evaluate a position against the user's fences and report enter/exit"""
+    point = _to_ping(ping)
+    roles = await load_fence_roles(current_user.id)
+    await load_position(current_user.id, roles)
+    offices_before = offices_inside(current_user.id)
+    transitions = evaluate_pings(current_user.id, roles, [point])
+
+    _record(current_user.id, [point], transitions)
+    _fire_entered(current_user.id, transitions)
+    _publish_transitions(current_user.id, roles, transitions)
+    await update_rollups(current_user.id, offices_before, transitions)
+    return PingResult(**_ping_result(current_user.id, transitions))
+
+
+@router.post(
+    "/ping/batch",
+    response_model=BatchPingResult,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "array",
+                        "items": {"$ref": "#/components/schemas/PingInput"},
+                    }
+                },
+                "application/x-ndjson": {
+                    "schema": {"$ref": "#/components/schemas/PingInput"}
+                },
+            },
+        }
+    },
+)
+async def location_ping_batch(
+    request: Request, current_user: User = Depends(get_current_user)
+):
+    """Replay buffered positions, sent as a JSON array or NDJSON lines"""
+    body = await _read_batch(request)
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        inputs = _parse_ndjson(body)
+    else:
+        inputs = _parse_json(body)
+
+    pings = [_to_ping(ping) for ping in inputs]
+    roles = await load_fence_roles(current_user.id)
+    await load_position(current_user.id, roles)
+    offices_before = offices_inside(current_user.id)
+    transitions = evaluate_pings(current_user.id, roles, pings)
+
+    _record(current_user.id, pings, transitions)
+    _fire_entered(current_user.id, transitions)
+    _publish_transitions(current_user.id, roles, transitions)
+    await update_rollups(current_user.id, offices_before, transitions)
+    return BatchPingResult(
+        received=len(pings), **_ping_result(current_user.id, transitions)
+    )
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends
+
+from app.models.user import User
+from app.utils import replica
+from app.utils.auth import get_current_user, principal_cache, token_cache
+from app.utils.fence_index import fence_sync
+from app.utils.memberships import membership_cache
+from app.utils.pubsub import broker
+from app.utils.scheduler import action_sync, scheduler
+from app.utils.triggers import triggers
+from app.utils.writer import attendance_writer, ping_writer
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/")
+async def get_metrics(current_user: User = Depends(get_current_user)):
+    """In-process counters for monitoring, for signed-in users only"""
+    return {
+        "principal_cache": principal_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "membership_cache": membership_cache.stats(),
+        "ping_writer": ping_writer.stats(),
+        "attendance_writer": attendance_writer.stats(),
+        "scheduler": scheduler.stats(),
+        "triggers": triggers.stats(),
+        "pubsub": broker.stats(),
+        "fence_index": fence_sync.stats(),
+        "action_index": action_sync.stats(),
+        "replica": replica.stats(),
+    }
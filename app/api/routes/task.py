@@ -1,13 +1,20 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
+from tortoise.queryset import QuerySet, ValuesQuery
 
+from app.config import config
 from app.models.location import Location
 from app.models.task import Task, Task_Pydantic
 from app.models.user import User
 from app.utils.auth import get_current_user
+from app.utils.pagination import Keyset, page_limit, parse_datetime
+from app.utils.replica import read_replica
+from app.utils.responses import RowList
+from app.utils.rows import fetch_rows
+from app.utils.task_tree import add_progress, fetch_subtree
 
 router = APIRouter(prefix="/task", tags=["task"])
 
@@ -25,6 +32,58 @@ class TaskCreate(BaseModel):
 
 router = APIRouter(prefix="/task", tags=["task"])
 
+TASK_PAGES = Keyset("due_date", parse=parse_datetime)
+
+
+class TaskInfo(BaseModel):
+    id: int
+    title: str
+    start_date: datetime
+    due_date: datetime
+    completed: bool
+    parent_task_id: Optional[int]
+    location_id: Optional[int]
+    user_id: int
+
+
+class TaskNode(TaskInfo):
+    depth: int
+    completed_count: int
+    total_count: int
+
+
+TASK_ROWS = RowList(TaskInfo)
+NODE_ROWS = RowList(TaskNode)
+LOCATION_TASK_ROWS = RowList(Task_Pydantic)
+
+
+def task_page_query(
+    user_id: int,
+    cursor: Optional[str],
+    limit: int,
+    completed: Optional[bool] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+) -> ValuesQuery:
+    query = Task.filter(user_id=user_id)
+    if completed is not None:
+        query = query.filter(completed=completed)
+    if due_after is not None:
+        query = query.filter(due_date__gte=due_after)
+    if due_before is not None:
+        query = query.filter(due_date__lt=due_before)
+    return TASK_PAGES.query(query, TaskInfo.model_fields, cursor, limit)
+
+
+def location_task_query(location_id: int, user_id: int) -> ValuesQuery:
+    return Task.filter(location_id=location_id, user_id=user_id).values(
+        *Task_Pydantic.model_fields
+    )
+
+
+def subtask_query(task_id: int, user_id: int) -> QuerySet[Task]:
+    return Task.filter(user_id=user_id, parent_task_id=task_id)
+
 
 @router.post("/new", response_model=Task_Pydantic)
 async def create_task(
@@ -57,22 +116,47 @@ async def create_task(
     return await Task_Pydantic.from_tortoise_orm(task)
 
 
-@router.get("/view/location/{location_id}")
+@router.get(
+    "/view/location/{location_id}",
+    response_model=List[Task_Pydantic],
+    dependencies=[Depends(read_replica)],
+)
 async def get_task_by_location(
     location_id: int, current_user: User = Depends(get_current_user)
 ):
+    # Plain rows validated and encoded in one pass, not one ORM object each
+    rows = await fetch_rows(location_task_query(location_id, current_user.id))
+    return LOCATION_TASK_ROWS.response(rows)
+
+
+@router.get(
+    "/view/{task_id}/tree",
+    response_model=List[TaskNode],
+    dependencies=[Depends(read_replica)],
+)
+async def get_task_tree(
+    task_id: int,
+    depth: int = Query(config.subtree_max_depth, ge=0, le=config.subtree_max_depth),
+    current_user: User = Depends(get_current_user),
+):
+    """A task with all its subtasks down to `depth` levels, breadth first
 
-    tasks = await Task.filter(location__id=location_id, user=current_user).all()
-    return [await Task_Pydantic.from_tortoise_orm(task) for task in tasks]
+    The tree comes flat, rebuild it from parent_task_id; each node carries
+    the completed/total count of its own subtree.
+    """
+    rows = await fetch_subtree(task_id, current_user.id, depth)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return NODE_ROWS.response(add_progress(rows))
 
 
-@router.get("/view/{task_id}/subtask")
+@router.get("/view/{task_id}/subtask", dependencies=[Depends(read_replica)])
 async def get_subtasks(task_id: int, current_user: User = Depends(get_current_user)):
-    subtasks = await Task.filter(user=current_user, parent_task=task_id)
+    subtasks = await subtask_query(task_id, current_user.id)
     return subtasks
 
 
-@router.get("/view/{task_id}")
+@router.get("/view/{task_id}", dependencies=[Depends(read_replica)])
 async def get_task_by_id(task_id: int, current_user: User = Depends(get_current_user)):
     task = await Task.get_or_none(id=task_id, user=current_user)
     if not task:
@@ -80,12 +164,26 @@ async def get_task_by_id(task_id: int, current_user: User = Depends(get_current_
     return await Task_Pydantic.from_tortoise_orm(task)
 
 
-@router.get("/view")
-async def get_tasks(current_user: User = Depends(get_current_user)):
-    tasks = await (
-        Task.filter(user=current_user).prefetch_related("parent_task", "location").all()
+@router.get(
+    "/view",
+    response_model=List[TaskInfo],
+    dependencies=[Depends(read_replica)],
+)
+async def get_tasks(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Depends(page_limit),
+    completed: Optional[bool] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+):
+    """Tasks by due date, a page at a time; the next cursor is in X-Next-Cursor"""
+    query = task_page_query(
+        current_user.id, cursor, limit, completed, due_after, due_before
     )
-    return tasks
+    rows = await TASK_PAGES.fetch(query, limit, response)
+    return TASK_ROWS.response(rows, response)
 
 
 #
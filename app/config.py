@@ -1,5 +1,6 @@
 import os
 from dataclasses import dataclass
+from typing import List
 
 from dotenv import load_dotenv
 
@@ -9,14 +10,112 @@ load_dotenv()
 @dataclass
 class Config:
     database_url: str
+    database_read_url: str
+    replica_sticky_seconds: float
+    migrate_on_start: bool
+    db_pool_min_size: int
+    db_pool_max_size: int
+    db_pool_max_queries: int
+    db_pool_max_idle_seconds: float
+    db_connect_timeout: float
+    db_command_timeout: float
+    db_statement_cache_size: int
+    sqlite_journal_mode: str
+    sqlite_synchronous: str
+    sqlite_busy_timeout_ms: int
+    sqlite_mmap_size: int
     jwt_secret: str
     jwt_valid_duration: int
     encoding_algorithm: str
+    password_hash_executor: str
+    password_hash_workers: int
+    password_hash_queue_depth: int
+    principal_cache_size: int
+    principal_cache_ttl: int
+    token_cache_size: int
+    token_cache_ttl: int
+    membership_cache_size: int
+    membership_cache_ttl: int
+    fence_radius_meters: int
+    ping_batch_max: int
+    write_batch_rows: int
+    write_batch_interval_ms: int
+    attendance_timezone: str
+    scheduler_workers: int
+    scheduler_queue_size: int
+    trigger_modules: List[str]
+    trigger_concurrency: int
+    trigger_timeout: float
+    trigger_retries: int
+    trigger_backoff: float
+    pubsub_buffer_size: int
+    pubsub_url: str
+    pubsub_outbox_size: int
+    stream_heartbeat_seconds: int
+    page_size_default: int
+    page_size_max: int
+    subtree_max_depth: int
 
 
 config = Config(
     database_url=os.getenv("DATABASE_URL", "sqlite:///app/app/database.db"),
+    # Optional replica for read-only routes; empty sends everything to DATABASE_URL
+    database_read_url=os.getenv("DATABASE_READ_URL", ""),
+    # How long a caller's reads stay on the primary after it writes
+    replica_sticky_seconds=float(os.getenv("REPLICA_STICKY_SECONDS", "5")),
+    # Convenient for a single dev server; deployments run `python -m app.migrate`
+    migrate_on_start=os.getenv("MIGRATE_ON_START", "false").lower() == "true",
+    # asyncpg pool, per worker process
+    db_pool_min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+    db_pool_max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+    db_pool_max_queries=int(os.getenv("DB_POOL_MAX_QUERIES", "50000")),
+    db_pool_max_idle_seconds=float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300")),
+    db_connect_timeout=float(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+    db_command_timeout=float(os.getenv("DB_COMMAND_TIMEOUT", "30")),
+    # Set to 0 behind a transaction-mode pooler such as PgBouncer
+    db_statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100")),
+    # WAL lets readers run alongside the writer; NORMAL only fsyncs at checkpoints
+    sqlite_journal_mode=os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    sqlite_synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # How long a worker waits for another worker's write lock before failing
+    sqlite_busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    sqlite_mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
     jwt_secret=os.getenv("JWT_SECRET", "secret"),
     jwt_valid_duration=12,
     encoding_algorithm="HS256",
+    # "thread" or "process"; bcrypt releases the GIL so threads are usually enough
+    password_hash_executor=os.getenv("PASSWORD_HASH_EXECUTOR", "thread"),
+    password_hash_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "4")),
+    password_hash_queue_depth=int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", "32")),
+    principal_cache_size=int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000")),
+    principal_cache_ttl=int(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+    token_cache_size=int(os.getenv("TOKEN_CACHE_SIZE", "10000")),
+    token_cache_ttl=int(os.getenv("TOKEN_CACHE_TTL", "300")),
+    # Other workers only see membership changes once their entry expires
+    membership_cache_size=int(os.getenv("MEMBERSHIP_CACHE_SIZE", "10000")),
+    membership_cache_ttl=int(os.getenv("MEMBERSHIP_CACHE_TTL", "30")),
+    # Saved locations have no radius of their own
+    fence_radius_meters=int(os.getenv("FENCE_RADIUS_METERS", "100")),
+    ping_batch_max=int(os.getenv("PING_BATCH_MAX", "5000")),
+    write_batch_rows=int(os.getenv("WRITE_BATCH_ROWS", "500")),
+    write_batch_interval_ms=int(os.getenv("WRITE_BATCH_INTERVAL_MS", "200")),
+    # Where a "day" starts and ends for attendance rollups
+    attendance_timezone=os.getenv("ATTENDANCE_TIMEZONE", "UTC"),
+    scheduler_workers=int(os.getenv("SCHEDULER_WORKERS", "8")),
+    scheduler_queue_size=int(os.getenv("SCHEDULER_QUEUE_SIZE", "1000")),
+    # Comma separated modules that register extra trigger handlers on import
+    trigger_modules=[m for m in os.getenv("TRIGGER_MODULES", "").split(",") if m],
+    trigger_concurrency=int(os.getenv("TRIGGER_CONCURRENCY", "16")),
+    trigger_timeout=float(os.getenv("TRIGGER_TIMEOUT", "10")),
+    trigger_retries=int(os.getenv("TRIGGER_RETRIES", "2")),
+    trigger_backoff=float(os.getenv("TRIGGER_BACKOFF", "0.5")),
+    # Events buffered per stream connection before the oldest are dropped
+    pubsub_buffer_size=int(os.getenv("PUBSUB_BUFFER_SIZE", "100")),
+    # "memory://" for a single worker, a postgres:// URL to relay between workers
+    pubsub_url=os.getenv("PUBSUB_URL", "memory://"),
+    pubsub_outbox_size=int(os.getenv("PUBSUB_OUTBOX_SIZE", "1000")),
+    stream_heartbeat_seconds=int(os.getenv("STREAM_HEARTBEAT_SECONDS", "15")),
+    page_size_default=int(os.getenv("PAGE_SIZE_DEFAULT", "100")),
+    page_size_max=int(os.getenv("PAGE_SIZE_MAX", "1000")),
+    subtree_max_depth=int(os.getenv("SUBTREE_MAX_DEPTH", "10000")),
 )
@@ -1,26 +1,57 @@
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from tortoise import Tortoise
 
 import app.api.routes as routes
 import app.models
 from app.config import config
+from app.migrations import check_schema_version, migrate
+from app.utils.action_index import rebuild_action_index
+from app.utils.auth import shutdown_password_hasher
+from app.utils.database import init_db
+from app.utils.fence_index import fence_sync, rebuild_fence_index
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.pubsub import broker
+from app.utils.replica import DatabaseSessionMiddleware
+from app.utils.scheduler import action_sync, scheduler
+from app.utils.triggers import triggers
+from app.utils.writer import start_writers, stop_writers
 
 
 @asynccontextmanager
 async def app_lifespan(app: FastAPI):
-    await Tortoise.init(db_url=config.database_url, modules={"models": ["app.models"]})
-    await Tortoise.generate_schemas()
+    await init_db()
+    if config.migrate_on_start:
+        await migrate()
+    else:
+        await check_schema_version()
+    await rebuild_fence_index()
+    await rebuild_action_index()
+    start_writers()
+    await broker.start()
+    fence_sync.start()
+    action_sync.start()
+    triggers.resolve()
+    scheduler.start()
 
     yield
+    await scheduler.stop()
+    await triggers.shutdown()
+    await action_sync.stop()
+    await fence_sync.stop()
+    await broker.stop()
+    await stop_writers()
     await Tortoise.close_connections()
+    shutdown_password_hasher()
 
 
 app = FastAPI(
     title="LifeFence",
     lifespan=app_lifespan,
+    default_response_class=ORJSONResponse,
 )
 app.include_router(routes.router)
 
@@ -32,4 +63,6 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+app.add_middleware(DatabaseSessionMiddleware)
@@ -0,0 +1,31 @@
+"""Bring the database schema up to date: `python -m app.migrate`
+
+Run once per deploy before any worker starts; workers only check that the
+schema version matches.
+"""
+
+import asyncio
+import logging
+
+from tortoise import Tortoise
+
+from app.migrations import migrate, schema_version
+from app.utils.database import init_db
+
+
+async def main() -> None:
+    await init_db()
+    try:
+        applied = await migrate()
+        version = await schema_version()
+    finally:
+        await Tortoise.close_connections()
+    if applied:
+        print(f"Applied {len(applied)} migration(s), schema at version {version}")
+    else:
+        print(f"Schema already at version {version}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,269 @@
+"""Baseline: every table as generate_schemas created it before migrations
+
+Tables and indexes are created only if missing, so databases that were set
+up by generate_schemas on boot are adopted as they are.
+"""
+
+SQL = {
+    "sqlite": r"""
+CREATE TABLE IF NOT EXISTS "group" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "name" VARCHAR(128) NOT NULL,
+    "description" TEXT,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS "user" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "name" VARCHAR(128) NOT NULL,
+    "username" VARCHAR(64) NOT NULL UNIQUE,
+    "email" VARCHAR(255) NOT NULL UNIQUE,
+    "password" VARCHAR(255) NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "dob" DATE NOT NULL,
+    "parent_id" INT REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "attendanceevent" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "fence_kind" VARCHAR(16) NOT NULL,
+    "fence_id" INT NOT NULL,
+    "event" VARCHAR(5) NOT NULL  /* ENTER: enter\nEXIT: exit */,
+    "timestamp" TIMESTAMP NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+) /* Append-only log of fence enter\/exit transitions */;
+CREATE TABLE IF NOT EXISTS "attendancerollup" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "day" DATE NOT NULL,
+    "first_in" TIMESTAMP,
+    "last_out" TIMESTAMP,
+    "dwell_seconds" INT NOT NULL  DEFAULT 0,
+    "inside_since" TIMESTAMP,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_attendancer_user_id_4ebdef" UNIQUE ("user_id", "day")
+) /* Per user per day summary of time spent inside office locations */;
+CREATE TABLE IF NOT EXISTS "groupevent" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "title" VARCHAR(255) NOT NULL,
+    "description" TEXT,
+    "location_lat" REAL NOT NULL,
+    "location_lng" REAL NOT NULL,
+    "trigger_radius_meters" INT NOT NULL  DEFAULT 100,
+    "start_time" TIMESTAMP NOT NULL,
+    "end_time" TIMESTAMP NOT NULL,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "created_by_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE,
+    "group_id" INT NOT NULL REFERENCES "group" ("id") ON DELETE CASCADE
+) /* Location-based events for groups */;
+CREATE TABLE IF NOT EXISTS "groupmembership" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "role" VARCHAR(6) NOT NULL  DEFAULT 'member' /* ADMIN: admin\nMEMBER: member */,
+    "joined_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "group_id" INT NOT NULL REFERENCES "group" ("id") ON DELETE CASCADE,
+    "invited_by_id" INT REFERENCES "user" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_groupmember_group_i_efd998" UNIQUE ("group_id", "user_id")
+);
+CREATE TABLE IF NOT EXISTS "grouptask" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "title" VARCHAR(255) NOT NULL,
+    "description" TEXT,
+    "due_date" TIMESTAMP,
+    "completed" INT NOT NULL  DEFAULT 0,
+    "created_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "assigned_to_id" INT REFERENCES "user" ("id") ON DELETE CASCADE,
+    "created_by_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE,
+    "group_id" INT NOT NULL REFERENCES "group" ("id") ON DELETE CASCADE
+) /* Tasks assigned within a group */;
+CREATE TABLE IF NOT EXISTS "location" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "address" VARCHAR(512),
+    "latitude" REAL NOT NULL,
+    "longitude" REAL NOT NULL,
+    "location_type" VARCHAR(64),
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "action" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "trigger_function" VARCHAR(128) NOT NULL,
+    "start_time" TIMESTAMP NOT NULL,
+    "end_time" TIMESTAMP NOT NULL,
+    "used" INT NOT NULL  DEFAULT 0,
+    "location_id" INT NOT NULL REFERENCES "location" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS "idx_action_user_id_966b8d" ON "action" ("user_id", "location_id", "used", "start_time", "end_time");
+CREATE INDEX IF NOT EXISTS "idx_action_used_e11687" ON "action" ("used", "end_time");
+CREATE TABLE IF NOT EXISTS "blacklist" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "location_id" INT NOT NULL REFERENCES "location" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "locationping" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "latitude" REAL NOT NULL,
+    "longitude" REAL NOT NULL,
+    "accuracy" REAL NOT NULL  DEFAULT 0,
+    "recorded_at" TIMESTAMP NOT NULL,
+    "received_at" TIMESTAMP NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+) /* Raw position reported by a client */;
+CREATE TABLE IF NOT EXISTS "office" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "location_id" INT NOT NULL REFERENCES "location" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "residence" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "location_id" INT NOT NULL REFERENCES "location" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "task" (
+    "id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    "title" VARCHAR(128) NOT NULL,
+    "start_date" TIMESTAMP NOT NULL,
+    "due_date" TIMESTAMP NOT NULL,
+    "completed" INT NOT NULL  DEFAULT 0,
+    "location_id" INT REFERENCES "location" ("id") ON DELETE CASCADE,
+    "parent_task_id" INT REFERENCES "task" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS "idx_task_parent__85e750" ON "task" ("parent_task_id");
+""",
+    "postgres": r"""
+CREATE TABLE IF NOT EXISTS "group" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(128) NOT NULL,
+    "description" TEXT,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS "user" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "name" VARCHAR(128) NOT NULL,
+    "username" VARCHAR(64) NOT NULL UNIQUE,
+    "email" VARCHAR(255) NOT NULL UNIQUE,
+    "password" VARCHAR(255) NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "dob" DATE NOT NULL,
+    "parent_id" INT REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "attendanceevent" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "fence_kind" VARCHAR(16) NOT NULL,
+    "fence_id" INT NOT NULL,
+    "event" VARCHAR(5) NOT NULL,
+    "timestamp" TIMESTAMPTZ NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+COMMENT ON COLUMN "attendanceevent"."event" IS 'ENTER: enter\nEXIT: exit';
+COMMENT ON TABLE "attendanceevent" IS 'Append-only log of fence enter/exit transitions';
+CREATE TABLE IF NOT EXISTS "attendancerollup" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "day" DATE NOT NULL,
+    "first_in" TIMESTAMPTZ,
+    "last_out" TIMESTAMPTZ,
+    "dwell_seconds" INT NOT NULL  DEFAULT 0,
+    "inside_since" TIMESTAMPTZ,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_attendancer_user_id_4ebdef" UNIQUE ("user_id", "day")
+);
+COMMENT ON TABLE "attendancerollup" IS 'Per user per day summary of time spent inside office locations';
+CREATE TABLE IF NOT EXISTS "groupevent" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "title" VARCHAR(255) NOT NULL,
+    "description" TEXT,
+    "location_lat" DOUBLE PRECISION NOT NULL,
+    "location_lng" DOUBLE PRECISION NOT NULL,
+    "trigger_radius_meters" INT NOT NULL  DEFAULT 100,
+    "start_time" TIMESTAMPTZ NOT NULL,
+    "end_time" TIMESTAMPTZ NOT NULL,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "created_by_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE,
+    "group_id" INT NOT NULL REFERENCES "group" ("id") ON DELETE CASCADE
+);
+COMMENT ON TABLE "groupevent" IS 'Location-based events for groups';
+CREATE TABLE IF NOT EXISTS "groupmembership" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "role" VARCHAR(6) NOT NULL  DEFAULT 'member',
+    "joined_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "group_id" INT NOT NULL REFERENCES "group" ("id") ON DELETE CASCADE,
+    "invited_by_id" INT REFERENCES "user" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_groupmember_group_i_efd998" UNIQUE ("group_id", "user_id")
+);
+COMMENT ON COLUMN "groupmembership"."role" IS 'ADMIN: admin\nMEMBER: member';
+CREATE TABLE IF NOT EXISTS "grouptask" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "title" VARCHAR(255) NOT NULL,
+    "description" TEXT,
+    "due_date" TIMESTAMPTZ,
+    "completed" BOOL NOT NULL  DEFAULT False,
+    "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "assigned_to_id" INT REFERENCES "user" ("id") ON DELETE CASCADE,
+    "created_by_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE,
+    "group_id" INT NOT NULL REFERENCES "group" ("id") ON DELETE CASCADE
+);
+COMMENT ON TABLE "grouptask" IS 'Tasks assigned within a group';
+CREATE TABLE IF NOT EXISTS "location" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "address" VARCHAR(512),
+    "latitude" DOUBLE PRECISION NOT NULL,
+    "longitude" DOUBLE PRECISION NOT NULL,
+    "location_type" VARCHAR(64),
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "action" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "trigger_function" VARCHAR(128) NOT NULL,
+    "start_time" TIMESTAMPTZ NOT NULL,
+    "end_time" TIMESTAMPTZ NOT NULL,
+    "used" BOOL NOT NULL  DEFAULT False,
+    "location_id" INT NOT NULL REFERENCES "location" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS "idx_action_user_id_966b8d" ON "action" ("user_id", "location_id", "used", "start_time", "end_time");
+CREATE INDEX IF NOT EXISTS "idx_action_used_e11687" ON "action" ("used", "end_time");
+CREATE TABLE IF NOT EXISTS "blacklist" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "location_id" INT NOT NULL REFERENCES "location" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "locationping" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "latitude" DOUBLE PRECISION NOT NULL,
+    "longitude" DOUBLE PRECISION NOT NULL,
+    "accuracy" DOUBLE PRECISION NOT NULL  DEFAULT 0,
+    "recorded_at" TIMESTAMPTZ NOT NULL,
+    "received_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+COMMENT ON TABLE "locationping" IS 'Raw position reported by a client';
+CREATE TABLE IF NOT EXISTS "office" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "location_id" INT NOT NULL REFERENCES "location" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "residence" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "location_id" INT NOT NULL REFERENCES "location" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS "task" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "title" VARCHAR(128) NOT NULL,
+    "start_date" TIMESTAMPTZ NOT NULL,
+    "due_date" TIMESTAMPTZ NOT NULL,
+    "completed" BOOL NOT NULL  DEFAULT False,
+    "location_id" INT REFERENCES "location" ("id") ON DELETE CASCADE,
+    "parent_task_id" INT REFERENCES "task" ("id") ON DELETE CASCADE,
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS "idx_task_parent__85e750" ON "task" ("parent_task_id");
+""",
+}
@@ -0,0 +1,20 @@
+"""Indexes for the filters the list, permission and fence lookups run
+
+Plain CREATE INDEX, which blocks writes to each table while it builds.
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS "idx_groupmember_user_id_e3c3c3" ON "groupmembership" ("user_id", "role");
+CREATE INDEX IF NOT EXISTS "idx_grouptask_group_i_cfbe84" ON "grouptask" ("group_id", "completed", "created_at");
+CREATE INDEX IF NOT EXISTS "idx_grouptask_assigne_fb6664" ON "grouptask" ("assigned_to_id", "completed");
+CREATE INDEX IF NOT EXISTS "idx_location_user_id_274f87" ON "location" ("user_id");
+CREATE INDEX IF NOT EXISTS "idx_blacklist_user_id_f21912" ON "blacklist" ("user_id");
+CREATE INDEX IF NOT EXISTS "idx_office_user_id_a9309c" ON "office" ("user_id");
+CREATE INDEX IF NOT EXISTS "idx_residence_user_id_fc1d62" ON "residence" ("user_id");
+CREATE INDEX IF NOT EXISTS "idx_task_user_id_a3152b" ON "task" ("user_id", "location_id");
+"""
+
+SQL = {
+    "sqlite": INDEXES,
+    "postgres": INDEXES,
+}
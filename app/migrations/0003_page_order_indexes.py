@@ -0,0 +1,19 @@
+"""Indexes in keyset page order, so a page reads its rows without sorting
+
+Plain CREATE INDEX, which blocks writes to each table while it builds. The
+(user_id, id) location index replaces the plain user_id one from 0002.
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS "idx_task_user_id_fb07ac" ON "task" ("user_id", "due_date", "id");
+CREATE INDEX IF NOT EXISTS "idx_grouptask_group_i_31eec1" ON "grouptask" ("group_id", "created_at", "id");
+CREATE INDEX IF NOT EXISTS "idx_grouptask_assigne_6dc524" ON "grouptask" ("assigned_to_id", "created_at", "id");
+CREATE INDEX IF NOT EXISTS "idx_groupmember_group_i_ed186f" ON "groupmembership" ("group_id", "id");
+CREATE INDEX IF NOT EXISTS "idx_location_user_id_7cc4d7" ON "location" ("user_id", "id");
+DROP INDEX IF EXISTS "idx_location_user_id_274f87";
+"""
+
+SQL = {
+    "sqlite": INDEXES,
+    "postgres": INDEXES,
+}
@@ -0,0 +1,14 @@
+"""Indexes a worker reads a user's fence state back from the logs with
+
+Plain CREATE INDEX, which blocks writes to each table while it builds.
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS "idx_locationpin_user_id_995b7c" ON "locationping" ("user_id", "recorded_at");
+CREATE INDEX IF NOT EXISTS "idx_attendancee_user_id_99a240" ON "attendanceevent" ("user_id", "fence_kind", "fence_id", "timestamp");
+"""
+
+SQL = {
+    "sqlite": INDEXES,
+    "postgres": INDEXES,
+}
@@ -0,0 +1,117 @@
+"""Versioned schema migrations
+
+Each module in this package named NNNN_description.py is one migration. It
+holds the SQL to apply per dialect in a SQL dict, as plain statements ending
+in a semicolon and a newline. Migrations are applied in version order by
+`python -m app.migrate`, each in its own transaction together with its row in
+the schema_migration table.
+"""
+
+import importlib
+import logging
+import pkgutil
+import re
+from typing import List, Tuple
+
+from tortoise import Tortoise
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_NAME = re.compile(r"^(\d{4})_(\w+)$")
+
+VERSION_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migration (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(128) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Arbitrary key for the Postgres advisory lock held while migrating
+MIGRATION_LOCK_KEY = 4143335
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+def migrations() -> List[Tuple[int, str, dict]]:
+    """(version, name, SQL per dialect) of every migration, oldest first"""
+    found = []
+    for module in pkgutil.iter_modules(__path__):
+        match = MIGRATION_NAME.match(module.name)
+        if match is None:
+            continue
+        sql = importlib.import_module(f"{__name__}.{module.name}").SQL
+        found.append((int(match.group(1)), match.group(2), sql))
+    return sorted(found)
+
+
+LATEST_VERSION = migrations()[-1][0]
+
+
+def _statements(script: str) -> List[str]:
+    return [s for s in re.split(r";\s*\n", script + "\n") if s.strip()]
+
+
+async def _applied(db: BaseDBAsyncClient) -> set:
+    rows = await db.execute_query_dict("SELECT version FROM schema_migration")
+    return {row["version"] for row in rows}
+
+
+async def migrate() -> List[int]:
+    """Apply every pending migration, returning the versions applied
+
+    Safe to run from several processes at once: on Postgres each migration
+    holds an advisory lock and re-checks the version table, elsewhere the
+    version's primary key makes a second attempt roll back.
+    """
+    db = Tortoise.get_connection("default")
+    dialect = db.capabilities.dialect
+    done = []
+    for version, name, sql in migrations():
+        if dialect not in sql:
+            raise SchemaVersionError(f"Migration {version} has no {dialect} SQL")
+        async with in_transaction("default") as conn:
+            if dialect == "postgres":
+                await conn.execute_query(
+                    f"SELECT pg_advisory_xact_lock({MIGRATION_LOCK_KEY})"
+                )
+            await conn.execute_query(VERSION_TABLE_SQL)
+            if version in await _applied(conn):
+                continue
+            for statement in _statements(sql[dialect]):
+                await conn.execute_query(statement)
+            await conn.execute_query(
+                "INSERT INTO schema_migration (version, name) VALUES ({0}, '{1}')".format(
+                    version, name
+                )
+            )
+        logger.info("Applied migration %04d_%s", version, name)
+        done.append(version)
+    return done
+
+
+async def schema_version() -> int:
+    """Version of the newest migration applied, 0 for an unmigrated database"""
+    db = Tortoise.get_connection("default")
+    try:
+        rows = await db.execute_query_dict(
+            "SELECT MAX(version) AS version FROM schema_migration"
+        )
+    except Exception:
+        # No version table yet
+        return 0
+    return rows[0]["version"] or 0
+
+
+async def check_schema_version() -> None:
+    """Refuse to start against a database older than this code expects"""
+    version = await schema_version()
+    if version < LATEST_VERSION:
+        raise SchemaVersionError(
+            f"Database schema is at version {version}, expected {LATEST_VERSION}."
+            " Run `python -m app.migrate` first."
+        )
@@ -3,6 +3,12 @@ import typing
 import tortoise
 
 from app.models.actions import Action, Action_Pydantic
+from app.models.attendance import (
+    AttendanceEvent,
+    AttendanceEvent_Pydantic,
+    AttendanceEventType,
+    AttendanceRollup,
+)
 from app.models.group import (
     Group,
     Group_Pydantic,
@@ -21,6 +27,7 @@ from app.models.location import (
     Blacklist_Pydantic,
     Location,
     Location_Pydantic,
+    LocationPing,
     Office,
     Residence,
 )
@@ -30,10 +37,15 @@ from app.models.user import User, User_Pydantic
 __all__ = (
     "Action",
     "Action_Pydantic",
+    "AttendanceEvent",
+    "AttendanceEvent_Pydantic",
+    "AttendanceEventType",
+    "AttendanceRollup",
     "Blacklist",
     "Blacklist_Pydantic",
     "Location",
     "Location_Pydantic",
+    "LocationPing",
     "Office",
     "Residence",
     "Task",
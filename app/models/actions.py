@@ -13,5 +13,13 @@ class Action(Model):
     user = fields.ForeignKeyField("models.User", related_name="user_action")
     used = fields.BooleanField(default=False)
 
+    class Meta:
+        indexes = (
+            # Open-window lookups for a user at a location
+            ("user", "location", "used", "start_time", "end_time"),
+            # Loading every window that has not closed yet
+            ("used", "end_time"),
+        )
+
 
 Action_Pydantic = pydantic_model_creator(Action)
@@ -0,0 +1,44 @@
+from enum import Enum
+
+from tortoise import Model, fields
+from tortoise.contrib.pydantic import pydantic_model_creator
+
+
+class AttendanceEventType(str, Enum):
+    ENTER = "enter"
+    EXIT = "exit"
+
+
+class AttendanceEvent(Model):
+    """Append-only log of fence enter/exit transitions"""
+
+    id = fields.BigIntField(primary_key=True)
+    user = fields.ForeignKeyField("models.User", related_name="user_attendance_event")
+    fence_kind = fields.CharField(max_length=16)
+    fence_id = fields.IntField()
+    event = fields.CharEnumField(AttendanceEventType)
+    timestamp = fields.DatetimeField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        # The latest transition of a user on one fence
+        indexes = (("user", "fence_kind", "fence_id", "timestamp"),)
+
+
+class AttendanceRollup(Model):
+    """Per user per day summary of time spent inside office locations"""
+
+    id = fields.IntField(pk=True)
+    user = fields.ForeignKeyField("models.User", related_name="user_attendance_rollup")
+    day = fields.DateField()
+    first_in = fields.DatetimeField(null=True)
+    last_out = fields.DatetimeField(null=True)
+    dwell_seconds = fields.IntField(default=0)
+    # Start of the office stay still in progress, credited on exit
+    inside_since = fields.DatetimeField(null=True)
+
+    class Meta:
+        unique_together = (("user", "day"),)
+
+
+AttendanceEvent_Pydantic = pydantic_model_creator(AttendanceEvent)
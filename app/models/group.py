@@ -36,6 +36,12 @@ class GroupMembership(Model):
 
     class Meta:
         unique_together = (("group", "user"),)
+        indexes = (
+            # A user's groups and roles; the unique constraint covers group lookups
+            ("user", "role"),
+            # A group's members in page order
+            ("group", "id"),
+        )
 
 
 # Modify Task model to include group field
@@ -20,6 +20,17 @@ class GroupTask(models.Model):
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
 
+    class Meta:
+        indexes = (
+            # A group's tasks, newest first, optionally by completion
+            ("group", "completed", "created_at"),
+            # Tasks assigned to a user
+            ("assigned_to", "completed"),
+            # Both lists in page order, so pages don't sort
+            ("group", "created_at", "id"),
+            ("assigned_to", "created_at", "id"),
+        )
+
 
 class GroupEvent(models.Model):
     """Location-based events for groups"""
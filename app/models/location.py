@@ -10,6 +10,10 @@ class Location(Model):
     location_type = fields.CharField(max_length=64, null=True)
     user = fields.ForeignKeyField("models.User", related_name="user_location")
 
+    class Meta:
+        # A user's locations in page order
+        indexes = (("user", "id"),)
+
 
 class Blacklist(Model):
     id = fields.IntField(primary_key=True)
@@ -17,7 +21,7 @@ class Blacklist(Model):
         "models.Location", related_name="blacklisted_location"
     )
     user = fields.ForeignKeyField(
-        "models.User", related_name="user_blacklisted_location"
+        "models.User", related_name="user_blacklisted_location", db_index=True
     )
 
 
@@ -25,12 +29,32 @@ class Residence(Model):
     location = fields.ForeignKeyField(
         "models.Location", related_name="residence_location"
     )
-    user = fields.ForeignKeyField("models.User", related_name="user_residence_location")
+    user = fields.ForeignKeyField(
+        "models.User", related_name="user_residence_location", db_index=True
+    )
 
 
 class Office(Model):
     location = fields.ForeignKeyField("models.Location", related_name="office_location")
-    user = fields.ForeignKeyField("models.User", related_name="user_office_location")
+    user = fields.ForeignKeyField(
+        "models.User", related_name="user_office_location", db_index=True
+    )
+
+
+class LocationPing(Model):
+    """Raw position reported by a client"""
+
+    id = fields.BigIntField(primary_key=True)
+    user = fields.ForeignKeyField("models.User", related_name="user_location_ping")
+    latitude = fields.FloatField()
+    longitude = fields.FloatField()
+    accuracy = fields.FloatField(default=0)
+    recorded_at = fields.DatetimeField()
+    received_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        # A user's latest ping, for workers that haven't seen them yet
+        indexes = (("user", "recorded_at"),)
 
 
 Location_Pydantic = pydantic_model_creator(Location)
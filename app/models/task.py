@@ -9,12 +9,20 @@ class Task(Model):
     due_date = fields.DatetimeField()
     completed = fields.BooleanField(default=False)
     parent_task = fields.ForeignKeyField(
-        "models.Task", related_name="subtask", null=True
+        "models.Task", related_name="subtask", null=True, db_index=True
     )
     location = fields.ForeignKeyField(
         "models.Location", related_name="task_location", null=True
     )
     user = fields.ForeignKeyField("models.User", related_name="user_task")
 
+    class Meta:
+        indexes = (
+            # A user's tasks, and their tasks at a location
+            ("user", "location"),
+            # A user's tasks in page order, so pages don't sort
+            ("user", "due_date", "id"),
+        )
+
 
 Task_Pydantic = pydantic_model_creator(Task)
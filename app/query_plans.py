@@ -0,0 +1,218 @@
+"""Check that route queries use indexes: `python -m app.query_plans`
+
+Runs the query behind each route through EXPLAIN on the DATABASE_URL
+database (SQLite or Postgres) and exits non-zero if any of them reads a whole
+table, if a paged query sorts its rows instead of reading them in index
+order, or if a model declares an index no migration has created. Point it at
+a freshly migrated database, e.g. in CI right after `python -m app.migrate`.
+"""
+
+import asyncio
+import re
+import sys
+from datetime import UTC, date, datetime
+from typing import Callable, Dict, List, Tuple
+
+from tortoise import Tortoise
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+from tortoise.utils import get_schema_sql
+
+from app.api.routes.actions import open_action_query
+from app.api.routes.attendance import report_query
+from app.api.routes.group import (
+    admin_group_query,
+    group_page_query,
+    member_page_query,
+)
+from app.api.routes.group_task import (
+    _task_filters,
+    assigned_task_page_query,
+    group_task_page_query,
+)
+from app.api.routes.location import (
+    blacklist_query,
+    location_page_query,
+    office_query,
+    residence_query,
+)
+from app.api.routes.task import (
+    location_task_query,
+    subtask_query,
+    task_page_query,
+)
+from app.models import Blacklist, Office, Residence
+from app.utils.action_index import pending_action_query
+from app.utils.auth import user_query
+from app.utils.database import init_db
+from app.utils.fence_index import Fence
+from app.utils.geofence import fence_role_query, latest_ping, latest_transition
+from app.utils.memberships import roles_query
+from app.utils.pagination import encode_cursor
+from app.utils.task_tree import _subtree_query
+
+NOW = datetime(2024, 1, 1, tzinfo=UTC)
+CURSOR = encode_cursor(NOW.isoformat(), 1)
+START, END = date(2024, 1, 1), date(2024, 1, 31)
+
+
+# Route -> builds (sql, params) for the database it will be explained on. The
+# queries come from the same builders the routes call, with sample arguments.
+QUERIES: Dict[str, Callable[[BaseDBAsyncClient], Tuple[str, list]]] = {
+    "auth.login": lambda db: (user_query("u").sql(), []),
+    "auth.current_user": lambda db: (user_query("u", 1).sql(), []),
+    "memberships.load_roles": lambda db: (roles_query(1).sql(), []),
+    "fence_roles.office": lambda db: (fence_role_query(Office, 1).sql(), []),
+    "fence_roles.residence": lambda db: (fence_role_query(Residence, 1).sql(), []),
+    "fence_roles.blacklist": lambda db: (fence_role_query(Blacklist, 1).sql(), []),
+    "geofence.latest_ping": lambda db: (latest_ping(1).sql(), []),
+    "geofence.latest_transition": lambda db: (
+        latest_transition(1, Fence("office", 1, 0.0, 0.0, 100)).sql(),
+        [],
+    ),
+    "task.view": lambda db: (task_page_query(1, None, 100).sql(), []),
+    "task.view.cursor": lambda db: (
+        task_page_query(1, CURSOR, 100, completed=False).sql(),
+        [],
+    ),
+    "task.view.location": lambda db: (location_task_query(1, 1).sql(), []),
+    "task.view.subtask": lambda db: (subtask_query(1, 1).sql(), []),
+    "task.view.tree": lambda db: (_subtree_query(db), [1, 1, 10]),
+    "group.list": lambda db: (group_page_query(1, None, 100).sql(), []),
+    "group.admin": lambda db: (admin_group_query(1).sql(), []),
+    "group.details": lambda db: (member_page_query(1, 1, 1001).sql(), []),
+    "group_task.view": lambda db: (
+        group_task_page_query(1, _task_filters(), None, 100).sql(),
+        [],
+    ),
+    "group_task.view.completed": lambda db: (
+        group_task_page_query(1, _task_filters(completed=False), CURSOR, 100).sql(),
+        [],
+    ),
+    "group_task.assigned": lambda db: (
+        assigned_task_page_query(1, _task_filters(), None, 100).sql(),
+        [],
+    ),
+    "location.view.all": lambda db: (location_page_query(1, None, None, 100).sql(), []),
+    "location.view.residence": lambda db: (residence_query(1).sql(), []),
+    "location.view.office": lambda db: (office_query(1).sql(), []),
+    "location.view.blacklist": lambda db: (blacklist_query(1).sql(), []),
+    "actions.open": lambda db: (open_action_query(1, 1, NOW).sql(), []),
+    "actions.rebuild": lambda db: (pending_action_query(NOW).sql(), []),
+    "attendance.report": lambda db: (report_query(START, END, 1, None).sql(), []),
+    "attendance.report.group": lambda db: (report_query(START, END, 1, 1).sql(), []),
+}
+
+# How each dialect reports reading a whole table
+FULL_SCANS = {
+    "sqlite": re.compile(r"^SCAN (\w+)$"),
+    "postgres": re.compile(r"Seq Scan on (\w+)"),
+}
+
+# How each dialect reports sorting rows it could not read in order
+SORTS = {
+    "sqlite": re.compile(r"^USE TEMP B-TREE FOR .*ORDER BY"),
+    "postgres": re.compile(r"^(?:->\s+)?(?:Incremental )?Sort\s+\("),
+}
+
+# Keyset pages must come straight off an index, or every page sorts all the
+# matching rows. group.list is left out: it orders by the joined group, and
+# sorts only the caller's memberships.
+PAGED = {
+    "task.view",
+    "task.view.cursor",
+    "group.details",
+    "group_task.view",
+    "group_task.view.completed",
+    "group_task.assigned",
+    "location.view.all",
+}
+
+INDEX_NAMES = {
+    "sqlite": "SELECT name FROM sqlite_master WHERE type = 'index'",
+    "postgres": "SELECT indexname AS name FROM pg_indexes"
+    " WHERE schemaname = current_schema()",
+}
+
+
+def _tables() -> set:
+    return {model._meta.db_table for model in Tortoise.apps["models"].values()}
+
+
+async def explain(db: BaseDBAsyncClient, sql: str, params: list) -> List[str]:
+    """Plan lines for a query"""
+    if db.capabilities.dialect == "postgres":
+        rows = await db.execute_query_dict(f"EXPLAIN {sql}", params)
+        return [row["QUERY PLAN"] for row in rows]
+    rows = await db.execute_query_dict(f"EXPLAIN QUERY PLAN {sql}", params)
+    return [row["detail"] for row in rows]
+
+
+def full_scans(dialect: str, plan: List[str]) -> List[str]:
+    """Tables in a plan that are read in full; CTE and temp scans don't count"""
+    tables = _tables()
+    pattern = FULL_SCANS[dialect]
+    return [
+        match.group(1)
+        for line in plan
+        if (match := pattern.search(line.strip())) and match.group(1) in tables
+    ]
+
+
+def sorts(dialect: str, plan: List[str]) -> List[str]:
+    """Plan lines that sort rows"""
+    pattern = SORTS[dialect]
+    return [line.strip() for line in plan if pattern.search(line.strip())]
+
+
+async def missing_indexes(db: BaseDBAsyncClient) -> List[str]:
+    """Indexes the models declare that the migrated database lacks"""
+    declared = re.findall(
+        r'CREATE INDEX IF NOT EXISTS "(\w+)"', get_schema_sql(db, safe=True)
+    )
+    rows = await db.execute_query_dict(INDEX_NAMES[db.capabilities.dialect])
+    present = {row["name"] for row in rows}
+    return [name for name in declared if name not in present]
+
+
+async def check() -> int:
+    await init_db()
+    failures = 0
+    try:
+        db = Tortoise.get_connection("default")
+        dialect = db.capabilities.dialect
+        if dialect not in FULL_SCANS:
+            print(f"Query plans can't be checked on {dialect}")
+            return 1
+
+        for name in await missing_indexes(db):
+            print(f"MISSING INDEX {name}: declared on a model but not migrated")
+            failures += 1
+
+        async with in_transaction("default") as conn:
+            if dialect == "postgres":
+                # Small test tables would be scanned anyway; ask whether an index
+                # could serve, and in order: bitmap scans lose the index order
+                await conn.execute_query("SET LOCAL enable_seqscan = off")
+                await conn.execute_query("SET LOCAL enable_bitmapscan = off")
+            for route, build in QUERIES.items():
+                plan = await explain(conn, *build(conn))
+                scanned = full_scans(dialect, plan)
+                sorting = sorts(dialect, plan) if route in PAGED else []
+                if scanned:
+                    print(f"FULL SCAN {route}: {', '.join(scanned)}")
+                if sorting:
+                    print(f"SORT {route}: {sorting[0]}")
+                if scanned or sorting:
+                    failures += 1
+                    for line in plan:
+                        print(f"    {line}")
+                else:
+                    print(f"ok {route}")
+    finally:
+        await Tortoise.close_connections()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(check()))
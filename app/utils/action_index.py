@@ -0,0 +1,182 @@
+import heapq
+from bisect import bisect_right, insort
+from datetime import UTC, datetime
+from typing import Dict, List, Optional, Tuple
+
+from tortoise.queryset import QuerySet
+from tortoise.signals import post_delete, post_save
+
+from app.models.actions import Action
+from app.utils.dates import as_utc
+from app.utils.pubsub import broker
+
+WindowKey = Tuple[int, int]  # (user_id, location_id)
+Window = Tuple[datetime, datetime, int]  # (start, end, action_id)
+
+
+class ActionWindowIndex:
+    """Unused actions whose window has not closed, bucketed per user and location
+
+    Windows are kept sorted by start so "what is open now" is a bisect plus a
+    short scan, and closed windows are evicted lazily from a heap of end times.
+    """
+
+    def __init__(self):
+        self._windows: Dict[WindowKey, List[Window]] = {}
+        self._actions: Dict[int, Tuple[WindowKey, Window]] = {}
+        self._ends: List[Tuple[datetime, int]] = []
+
+    def clear(self) -> None:
+        self._windows.clear()
+        self._actions.clear()
+        self._ends.clear()
+
+    def __len__(self) -> int:
+        return len(self._actions)
+
+    def get(self, action_id: int) -> Optional[Tuple[WindowKey, Window]]:
+        return self._actions.get(action_id)
+
+    def items(self):
+        return self._actions.items()
+
+    def add(
+        self,
+        action_id: int,
+        user_id: int,
+        location_id: int,
+        start_time: datetime,
+        end_time: datetime,
+    ) -> None:
+        self.remove(action_id)
+        key = (user_id, location_id)
+        window = (as_utc(start_time), as_utc(end_time), action_id)
+        insort(self._windows.setdefault(key, []), window)
+        self._actions[action_id] = (key, window)
+        heapq.heappush(self._ends, (window[1], action_id))
+
+    def remove(self, action_id: int) -> None:
+        entry = self._actions.pop(action_id, None)
+        if entry is None:
+            return
+        key, window = entry
+        windows = self._windows[key]
+        windows.remove(window)
+        if not windows:
+            del self._windows[key]
+
+    def prune(self, now: datetime) -> None:
+        """Drop every window that closed before `now`"""
+        while self._ends and self._ends[0][0] < now:
+            end_time, action_id = heapq.heappop(self._ends)
+            entry = self._actions.get(action_id)
+            # Stale heap entries are left behind when an action is re-added
+            if entry is not None and entry[1][1] == end_time:
+                self.remove(action_id)
+
+    def open_actions(
+        self, user_id: int, location_id: int, at: Optional[datetime] = None
+    ) -> List[int]:
+        """Ids of unused actions at a location whose window contains `at`"""
+        at = as_utc(at) if at is not None else datetime.now(UTC)
+        self.prune(at)
+        windows = self._windows.get((user_id, location_id))
+        if not windows:
+            return []
+        # Windows after this point have not opened yet
+        opened = bisect_right(windows, at, key=lambda window: window[0])
+        return [
+            action_id for _, end_time, action_id in windows[:opened] if end_time >= at
+        ]
+
+
+action_index = ActionWindowIndex()
+
+
+# Every worker keeps its own index; changes reach the others over pub/sub
+ACTION_TOPIC = "actions"
+
+
+def action_message(action: Action) -> dict:
+    if action.used or as_utc(action.end_time) < datetime.now(UTC):
+        return {"type": "remove", "id": action.id}
+    return {
+        "type": "add",
+        "id": action.id,
+        "user_id": action.user_id,
+        "location_id": action.location_id,
+        "start_time": as_utc(action.start_time).isoformat(),
+        "end_time": as_utc(action.end_time).isoformat(),
+    }
+
+
+def apply_action_message(message: dict) -> None:
+    if message["type"] == "add":
+        action_index.add(
+            message["id"],
+            message["user_id"],
+            message["location_id"],
+            datetime.fromisoformat(message["start_time"]),
+            datetime.fromisoformat(message["end_time"]),
+        )
+    elif message["type"] == "remove":
+        action_index.remove(message["id"])
+
+
+def index_action(action: Action) -> None:
+    apply_action_message(action_message(action))
+
+
+def _publish(message: dict) -> None:
+    apply_action_message(message)
+    broker.publish(ACTION_TOPIC, message)
+
+
+async def claim_action(
+    action_id: int, user_id: Optional[int] = None, at: Optional[datetime] = None
+) -> bool:
+    """Atomically mark an open action used, True only for the caller that won
+
+    A single conditional UPDATE, so concurrent triggers of the same action
+    can't both succeed.
+    """
+    at = at or datetime.now(UTC)
+    query = Action.filter(
+        id=action_id, used=False, start_time__lte=at, end_time__gte=at
+    )
+    if user_id is not None:
+        query = query.filter(user_id=user_id)
+
+    claimed = await query.update(used=True)
+    if claimed:
+        # Queryset updates bypass the save signals
+        _publish({"type": "remove", "id": action_id})
+    return bool(claimed)
+
+
+async def release_action(action: Action) -> None:
+    """Undo a claim whose handler never ran, so the action can fire again"""
+    if await Action.filter(id=action.id, used=True).update(used=False):
+        action.used = False
+        _publish(action_message(action))
+
+
+def pending_action_query(at: datetime) -> QuerySet[Action]:
+    return Action.filter(used=False, end_time__gte=at)
+
+
+async def rebuild_action_index() -> None:
+    """Load every unused action whose window has not closed yet"""
+    action_index.clear()
+    for action in await pending_action_query(datetime.now(UTC)):
+        index_action(action)
+
+
+@post_save(Action)
+async def _action_saved(sender, instance: Action, created, using_db, update_fields):
+    _publish(action_message(instance))
+
+
+@post_delete(Action)
+async def _action_deleted(sender, instance: Action, using_db):
+    _publish({"type": "remove", "id": instance.id})
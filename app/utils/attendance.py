@@ -0,0 +1,97 @@
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.config import config
+from app.models.attendance import AttendanceRollup
+from app.utils.geofence import Transition, positions
+
+timezone = ZoneInfo(config.attendance_timezone)
+
+
+def offices_inside(user_id: int) -> int:
+    position = positions.get(user_id)
+    if position is None:
+        return 0
+    return sum(1 for kind, _ in position.inside if kind == "office")
+
+
+def presence_changes(
+    offices_before: int, transitions: List[Transition]
+) -> List[Tuple[str, datetime]]:
+    """Collapse office transitions into arrivals and departures
+
+    Overlapping office fences count as one stay, so only the first enter and
+    the last exit matter.
+    """
+    changes = []
+    inside = offices_before
+    for transition in transitions:
+        if transition.fence.kind != "office":
+            continue
+        if transition.event == "enter":
+            inside += 1
+            if inside == 1:
+                changes.append(("in", transition.timestamp))
+        else:
+            inside = max(inside - 1, 0)
+            if inside == 0:
+                changes.append(("out", transition.timestamp))
+    return changes
+
+
+def split_by_day(start: datetime, end: datetime) -> Iterator[Tuple[date, int]]:
+    """Seconds between two instants, broken up by local calendar day"""
+    start = start.astimezone(timezone)
+    end = end.astimezone(timezone)
+    while start < end:
+        next_day = datetime.combine(
+            start.date() + timedelta(days=1), time(), tzinfo=timezone
+        )
+        chunk_end = min(next_day, end)
+        yield start.date(), int((chunk_end - start).total_seconds())
+        start = chunk_end
+
+
+async def _rollup(user_id: int, day: date) -> AttendanceRollup:
+    rollup, _ = await AttendanceRollup.get_or_create(user_id=user_id, day=day)
+    return rollup
+
+
+async def _open_stay(user_id: int) -> Optional[AttendanceRollup]:
+    return (
+        await AttendanceRollup.filter(user_id=user_id, inside_since__isnull=False)
+        .order_by("-day")
+        .first()
+    )
+
+
+async def update_rollups(
+    user_id: int, offices_before: int, transitions: List[Transition]
+) -> None:
+    """Fold new office transitions into the user's daily rollups"""
+    for change, timestamp in presence_changes(offices_before, transitions):
+        if change == "in":
+            if await _open_stay(user_id) is not None:
+                # Already inside as far as the rollups know, e.g. seen by a
+                # worker that had lost track of the user; keep the first start
+                continue
+            rollup = await _rollup(user_id, timestamp.astimezone(timezone).date())
+            if rollup.first_in is None:
+                rollup.first_in = timestamp
+            rollup.inside_since = timestamp
+            await rollup.save(update_fields=["first_in", "inside_since"])
+            continue
+
+        stay = await _open_stay(user_id)
+        if stay is not None:
+            for day, seconds in split_by_day(stay.inside_since, timestamp):
+                rollup = stay if day == stay.day else await _rollup(user_id, day)
+                rollup.dwell_seconds += seconds
+                await rollup.save(update_fields=["dwell_seconds"])
+            stay.inside_since = None
+            await stay.save(update_fields=["inside_since"])
+
+        rollup = await _rollup(user_id, timestamp.astimezone(timezone).date())
+        rollup.last_out = timestamp
+        await rollup.save(update_fields=["last_out"])
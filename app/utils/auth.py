@@ -1,3 +1,7 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
 from typing import Optional
 
@@ -5,23 +9,85 @@ from fastapi import HTTPException, Security
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from tortoise.queryset import QuerySetSingle
+from tortoise.signals import post_delete, post_save
 
 from app.models.user import User
+from app.utils.cache import TTLCache
 
 security = HTTPBearer()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 from app.config import config
 
+# Authenticated users keyed by token `sub`, so hot tokens skip the DB lookup
+principal_cache = TTLCache(
+    maxsize=config.principal_cache_size, ttl=config.principal_cache_ttl
+)
+# Verified JWT payloads keyed by token digest, so polling clients skip decode
+token_cache = TTLCache(maxsize=config.token_cache_size, ttl=config.token_cache_ttl)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+# bcrypt is deliberately slow, so hashing runs on a bounded pool off the event loop
+_hash_executor: Optional[Executor] = None
+_hash_pending = 0
+
+
+def _get_hash_executor() -> Executor:
+    global _hash_executor
+    if _hash_executor is None:
+        if config.password_hash_executor == "process":
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=config.password_hash_workers
+            )
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=config.password_hash_workers,
+                thread_name_prefix="password-hash",
+            )
+    return _hash_executor
+
+
+def shutdown_password_hasher() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+async def _run_hash_job(func, *args):
+    global _hash_pending
+    # Reject instead of queueing without bound when a login storm saturates the pool
+    if _hash_pending >= config.password_hash_workers + config.password_hash_queue_depth:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many authentication requests, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), func, *args)
+    finally:
+        _hash_pending -= 1
+
+
+def _verify_password_sync(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def get_password_hash(password: str) -> str:
+def _get_password_hash_sync(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hash_job(_verify_password_sync, plain_password, hashed_password)
+
+
+async def get_password_hash(password: str) -> str:
+    return await _run_hash_job(_get_password_hash_sync, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -36,14 +102,49 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 def decode_token(token: str) -> dict:
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(
             token, config.jwt_secret, algorithms=[config.encoding_algorithm]
         )
-        return payload
     except JWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
+    # Never serve a cached payload past the token's own expiry
+    ttl = float(config.token_cache_ttl)
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(digest, payload, ttl=ttl)
+    return payload
+
+
+def invalidate_principal(user_id: int) -> None:
+    principal_cache.pop_where(lambda _, user: user.id == user_id)
+
+
+@post_save(User)
+async def _user_saved(sender, instance: User, created, using_db, update_fields):
+    invalidate_principal(instance.id)
+
+
+@post_delete(User)
+async def _user_deleted(sender, instance: User, using_db):
+    invalidate_principal(instance.id)
+
+
+def user_query(
+    username: str, user_id: Optional[int] = None
+) -> QuerySetSingle[Optional[User]]:
+    # Newer tokens carry the user id, so the lookup can go by primary key
+    if user_id is not None:
+        return User.get_or_none(id=user_id, username=username)
+    return User.get_or_none(username=username)
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Security(security),
@@ -59,8 +160,13 @@ async def get_current_user(
     except Exception:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
-    user = await User.get_or_none(username=username)
+    user = principal_cache.get(username)
+    if user is not None:
+        return user
+
+    user = await user_query(username, payload.get("uid"))
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
 
+    principal_cache.set(username, user)
     return user
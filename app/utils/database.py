@@ -0,0 +1,58 @@
+from tortoise import Tortoise
+from tortoise.backends.base.config_generator import expand_db_url
+
+from app.config import config
+
+MODULES = {"models": ["app.models"]}
+
+
+def connection_settings(db_url: str) -> dict:
+    """Tortoise connection config for a URL with our pool or pragma settings
+
+    Parameters given in the URL's query string win over the environment.
+    """
+    connection = expand_db_url(db_url)
+    credentials = connection["credentials"]
+    if connection["engine"] == "tortoise.backends.asyncpg":
+        defaults = {
+            "minsize": config.db_pool_min_size,
+            "maxsize": config.db_pool_max_size,
+            "max_queries": config.db_pool_max_queries,
+            "max_inactive_connection_lifetime": config.db_pool_max_idle_seconds,
+            "timeout": config.db_connect_timeout,
+            "command_timeout": config.db_command_timeout,
+            "statement_cache_size": config.db_statement_cache_size,
+        }
+    elif connection["engine"] == "tortoise.backends.sqlite":
+        # Every extra credential becomes a PRAGMA on the connection
+        defaults = {
+            "journal_mode": config.sqlite_journal_mode,
+            "synchronous": config.sqlite_synchronous,
+            "busy_timeout": config.sqlite_busy_timeout_ms,
+            "mmap_size": config.sqlite_mmap_size,
+        }
+    else:
+        defaults = {}
+    for key, value in defaults.items():
+        credentials.setdefault(key, value)
+    return connection
+
+
+def tortoise_config() -> dict:
+    connections = {"default": connection_settings(config.database_url)}
+    routers = []
+    if config.database_read_url:
+        connections["replica"] = connection_settings(config.database_read_url)
+        routers.append("app.utils.replica.ReplicaRouter")
+    return {
+        "connections": connections,
+        "apps": {
+            label: {"models": modules, "default_connection": "default"}
+            for label, modules in MODULES.items()
+        },
+        "routers": routers,
+    }
+
+
+async def init_db() -> None:
+    await Tortoise.init(config=tortoise_config())
@@ -0,0 +1,6 @@
+from datetime import UTC, datetime
+
+
+def as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes as UTC, which is how the ORM stores them"""
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value
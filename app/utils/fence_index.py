@@ -0,0 +1,363 @@
+import heapq
+import math
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from tortoise.signals import post_delete, post_save
+
+from app.config import config
+from app.models.group_task import GroupEvent
+from app.models.location import Location
+from app.utils.dates import as_utc
+from app.utils.geo import haversine, haversine_matrix, within
+from app.utils.pubsub import IndexSync, broker
+
+FenceKey = Tuple[str, int]
+Cell = Tuple[int, int]
+
+METERS_PER_DEGREE = 111_320.0
+
+
+@dataclass(frozen=True)
+class Fence:
+    kind: str  # "location", "office", "residence", "blacklist" or "event"
+    id: int
+    latitude: float
+    longitude: float
+    radius: float
+    owner_id: Optional[int] = None  # user for locations, group for events
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+
+    @property
+    def key(self) -> FenceKey:
+        return (self.kind, self.id)
+
+
+class FenceIndex:
+    """Grid-bucket spatial index over circular fences
+
+    Each fence is registered in every cell its bounding box overlaps, so a
+    containment query only has to look at the single cell holding the point.
+    Fences too large to bucket sensibly are kept aside and always checked.
+    Longitude cells wrap around at the antimeridian, so `cell_size` should
+    divide 360.
+    """
+
+    def __init__(self, cell_size: float = 0.01, max_cells_per_fence: int = 64):
+        self.cell_size = cell_size  # degrees, roughly 1.1 km of latitude
+        self.max_cells_per_fence = max_cells_per_fence
+        self._columns = round(360 / cell_size)
+        self._fences: Dict[FenceKey, Fence] = {}
+        self._cells: Dict[Cell, Set[FenceKey]] = {}
+        self._fence_cells: Dict[FenceKey, List[Cell]] = {}
+        self._oversized: Set[FenceKey] = set()
+        self._ends: List[Tuple[datetime, FenceKey]] = []
+
+    def __len__(self) -> int:
+        return len(self._fences)
+
+    def _wrap(self, column: int) -> int:
+        half = self._columns // 2
+        return (column + half) % self._columns - half
+
+    def _cell(self, latitude: float, longitude: float) -> Cell:
+        return (
+            math.floor(latitude / self.cell_size),
+            self._wrap(math.floor(longitude / self.cell_size)),
+        )
+
+    def _bounds(
+        self, latitude: float, longitude: float, radius: float
+    ) -> Tuple[range, range]:
+        """Rows and unwrapped columns of the cells a circle's bounding box overlaps"""
+        d_lat = radius / METERS_PER_DEGREE
+        cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+        d_lng = min(d_lat / cos_lat, 180.0)
+        lat_lo = math.floor((latitude - d_lat) / self.cell_size)
+        lat_hi = math.floor((latitude + d_lat) / self.cell_size)
+        lng_lo = math.floor((longitude - d_lng) / self.cell_size)
+        lng_hi = math.floor((longitude + d_lng) / self.cell_size)
+        # Once the box spans the globe every column is in it exactly once
+        lng_hi = min(lng_hi, lng_lo + self._columns - 1)
+        return range(lat_lo, lat_hi + 1), range(lng_lo, lng_hi + 1)
+
+    def _keys_near(
+        self, latitude: float, longitude: float, radius: float
+    ) -> Set[FenceKey]:
+        """Keys bucketed in any cell of the circle's bounding box"""
+        rows, columns = self._bounds(latitude, longitude, radius)
+        keys: Set[FenceKey] = set()
+        if len(rows) * len(columns) > len(self._cells):
+            # Near the poles the box is mostly empty cells, go by occupied ones
+            for (i, _), bucket in self._cells.items():
+                if i in rows:
+                    keys |= bucket
+            return keys
+        for i in rows:
+            for j in columns:
+                bucket = self._cells.get((i, self._wrap(j)))
+                if bucket:
+                    keys |= bucket
+        return keys
+
+    def get(self, key: FenceKey) -> Optional[Fence]:
+        return self._fences.get(key)
+
+    def insert(self, fence: Fence) -> None:
+        self.remove(fence.key)
+        self._fences[fence.key] = fence
+
+        rows, columns = self._bounds(fence.latitude, fence.longitude, fence.radius)
+        if len(rows) * len(columns) > self.max_cells_per_fence:
+            self._oversized.add(fence.key)
+            # Still bucket the center so nearest() can find it by ring search
+            cells = [self._cell(fence.latitude, fence.longitude)]
+        else:
+            cells = [(i, self._wrap(j)) for i in rows for j in columns]
+        self._fence_cells[fence.key] = cells
+        for cell in cells:
+            self._cells.setdefault(cell, set()).add(fence.key)
+        if fence.end_time is not None:
+            heapq.heappush(self._ends, (fence.end_time, fence.key))
+
+    def remove(self, key: FenceKey) -> None:
+        if self._fences.pop(key, None) is None:
+            return
+        self._oversized.discard(key)
+        for cell in self._fence_cells.pop(key):
+            bucket = self._cells[cell]
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[cell]
+
+    def rebuild(self, fences: Iterable[Fence]) -> None:
+        self._fences.clear()
+        self._cells.clear()
+        self._fence_cells.clear()
+        self._oversized.clear()
+        self._ends.clear()
+        for fence in fences:
+            self.insert(fence)
+
+    def prune(self, now: datetime) -> None:
+        """Drop every fence whose end time passed before `now`"""
+        while self._ends and self._ends[0][0] < now:
+            end_time, key = heapq.heappop(self._ends)
+            fence = self._fences.get(key)
+            # Stale heap entries are left behind when a fence is re-inserted
+            if fence is not None and fence.end_time == end_time:
+                self.remove(key)
+
+    def query_point(
+        self, latitude: float, longitude: float, slack: float = 0
+    ) -> List[Fence]:
+        """Fences whose radius (plus `slack` meters) contains the point"""
+        if slack:
+            # The point may sit in a neighbouring cell of a fence's padded box
+            keys = self._keys_near(latitude, longitude, slack)
+        else:
+            keys = set(self._cells.get(self._cell(latitude, longitude), ()))
+        keys |= self._oversized
+
+        fences = [self._fences[key] for key in keys]
+        mask = within(
+            latitude,
+            longitude,
+            [fence.latitude for fence in fences],
+            [fence.longitude for fence in fences],
+            [fence.radius + slack for fence in fences],
+        )[0]
+        return [fence for fence, hit in zip(fences, mask) if hit]
+
+    def query_radius(
+        self, latitude: float, longitude: float, radius: float
+    ) -> List[Tuple[float, Fence]]:
+        """Fences centred within `radius` meters of the point, nearest first"""
+        keys = self._keys_near(latitude, longitude, radius)
+        fences = [self._fences[key] for key in keys]
+        distances = haversine_matrix(
+            latitude,
+            longitude,
+            [fence.latitude for fence in fences],
+            [fence.longitude for fence in fences],
+        )[0]
+        result = [
+            (float(distance), fence)
+            for distance, fence in zip(distances, fences)
+            if distance <= radius
+        ]
+        result.sort(key=lambda item: item[0])
+        return result
+
+    def nearest(
+        self, latitude: float, longitude: float, k: int
+    ) -> List[Tuple[float, Fence]]:
+        """The `k` fences with centres closest to the point, nearest first"""
+        if k <= 0 or not self._fences:
+            return []
+
+        center_i, center_j = self._cell(latitude, longitude)
+        # Width of one cell in meters where it is narrowest around the point
+        cos_lat = max(
+            math.cos(math.radians(min(abs(latitude) + self.cell_size, 90.0))), 1e-6
+        )
+        cell_meters = self.cell_size * METERS_PER_DEGREE * cos_lat
+
+        seen: Set[FenceKey] = set()
+        best: List[Tuple[float, FenceKey]] = []  # max-heap via negated distance
+        ring = 0
+        while True:
+            for i in range(center_i - ring, center_i + ring + 1):
+                for j in range(center_j - ring, center_j + ring + 1):
+                    if ring and abs(i - center_i) != ring and abs(j - center_j) != ring:
+                        continue
+                    for key in self._cells.get((i, self._wrap(j)), ()):
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        fence = self._fences[key]
+                        distance = haversine(
+                            latitude, longitude, fence.latitude, fence.longitude
+                        )
+                        if len(best) < k:
+                            heapq.heappush(best, (-distance, key))
+                        elif distance < -best[0][0]:
+                            heapq.heapreplace(best, (-distance, key))
+
+            # Anything not yet seen has its centre at least `ring` cells away
+            if len(seen) == len(self._fences):
+                break
+            if len(best) == k and -best[0][0] <= ring * cell_meters:
+                break
+            ring += 1
+            if (2 * ring + 1) ** 2 > len(self._cells):
+                # Sparse surroundings, scanning the rest beats walking empty rings
+                for key in self._fences.keys() - seen:
+                    fence = self._fences[key]
+                    distance = haversine(
+                        latitude, longitude, fence.latitude, fence.longitude
+                    )
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, key))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, key))
+                break
+
+        best.sort(reverse=True)
+        return [(-d, self._fences[key]) for d, key in best]
+
+
+fence_index = FenceIndex()
+
+
+def location_fence(location: Location) -> Fence:
+    return Fence(
+        "location",
+        location.id,
+        location.latitude,
+        location.longitude,
+        config.fence_radius_meters,
+        owner_id=location.user_id,
+    )
+
+
+def event_fence(event: GroupEvent) -> Fence:
+    return Fence(
+        "event",
+        event.id,
+        event.location_lat,
+        event.location_lng,
+        event.trigger_radius_meters,
+        owner_id=event.group_id,
+        start_time=as_utc(event.start_time),
+        end_time=as_utc(event.end_time),
+    )
+
+
+async def rebuild_fence_index() -> None:
+    """Load every saved location and unfinished group event into the index"""
+    fences = [location_fence(location) for location in await Location.all()]
+    fences.extend(
+        event_fence(event)
+        for event in await GroupEvent.filter(end_time__gte=datetime.now(UTC))
+    )
+    fence_index.rebuild(fences)
+
+
+# Every worker keeps its own index; changes reach the others over pub/sub
+FENCE_TOPIC = "fences"
+
+
+def _fence_message(fence: Fence) -> dict:
+    data = asdict(fence)
+    for name in ("start_time", "end_time"):
+        if data[name] is not None:
+            data[name] = data[name].isoformat()
+    return data
+
+
+def _message_fence(data: dict) -> Fence:
+    for name in ("start_time", "end_time"):
+        if data[name] is not None:
+            data[name] = datetime.fromisoformat(data[name])
+    return Fence(**data)
+
+
+def _apply(message: dict) -> None:
+    if message["type"] == "insert":
+        fence_index.insert(_message_fence(dict(message["fence"])))
+    elif message["type"] == "remove":
+        fence_index.remove(tuple(message["key"]))
+
+
+def _publish_insert(fence: Fence) -> None:
+    fence_index.insert(fence)
+    broker.publish(FENCE_TOPIC, {"type": "insert", "fence": _fence_message(fence)})
+
+
+def _publish_remove(key: FenceKey) -> None:
+    fence_index.remove(key)
+    broker.publish(FENCE_TOPIC, {"type": "remove", "key": list(key)})
+
+
+class FenceSync(IndexSync):
+    """Applies fence changes made on other workers and evicts ended events"""
+
+    topic = FENCE_TOPIC
+
+    def apply(self, message: dict) -> None:
+        _apply(message)
+
+    async def rebuild(self) -> None:
+        await rebuild_fence_index()
+
+    def tick(self) -> None:
+        fence_index.prune(datetime.now(UTC))
+
+    def stats(self) -> dict:
+        return {"fences": len(fence_index), **super().stats()}
+
+
+fence_sync = FenceSync()
+
+
+@post_save(Location)
+async def _location_saved(sender, instance: Location, created, using_db, update_fields):
+    _publish_insert(location_fence(instance))
+
+
+@post_delete(Location)
+async def _location_deleted(sender, instance: Location, using_db):
+    _publish_remove(("location", instance.id))
+
+
+@post_save(GroupEvent)
+async def _event_saved(sender, instance: GroupEvent, created, using_db, update_fields):
+    _publish_insert(event_fence(instance))
+
+
+@post_delete(GroupEvent)
+async def _event_deleted(sender, instance: GroupEvent, using_db):
+    _publish_remove(("event", instance.id))
@@ -0,0 +1,72 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_METERS = 6_371_008.8
+
+# Up to this distance the equirectangular approximation stays within about
+# 0.1% of haversine outside polar regions, far below GPS noise, and it skips
+# most of the trigonometry
+FAST_PATH_MAX_METERS = 10_000
+
+
+def haversine(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters between two points given in degrees"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+def _radians(lat, lng, fence_lat, fence_lng):
+    # Points become a column and fences a row, so results broadcast to N x M
+    phi1 = np.radians(np.asarray(lat, dtype=np.float64)).reshape(-1, 1)
+    lambda1 = np.radians(np.asarray(lng, dtype=np.float64)).reshape(-1, 1)
+    phi2 = np.radians(np.asarray(fence_lat, dtype=np.float64)).reshape(1, -1)
+    lambda2 = np.radians(np.asarray(fence_lng, dtype=np.float64)).reshape(1, -1)
+    return phi1, lambda1, phi2, lambda2
+
+
+def haversine_matrix(lat, lng, fence_lat, fence_lng) -> np.ndarray:
+    """N x M great-circle distances in meters between points and fence centres"""
+    phi1, lambda1, phi2, lambda2 = _radians(lat, lng, fence_lat, fence_lng)
+    a = (
+        np.sin((phi2 - phi1) / 2) ** 2
+        + np.cos(phi1) * np.cos(phi2) * np.sin((lambda2 - lambda1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _equirectangular_squared(lat, lng, fence_lat, fence_lng) -> np.ndarray:
+    # Squared angular distance, with longitude scaled at each fence's latitude
+    phi1, lambda1, phi2, lambda2 = _radians(lat, lng, fence_lat, fence_lng)
+    d_lambda = lambda2 - lambda1
+    # Wrap across the antimeridian so 179.9 and -179.9 are neighbours
+    d_lambda -= 2 * np.pi * np.rint(d_lambda / (2 * np.pi))
+    x = d_lambda * np.cos(phi2)
+    y = phi2 - phi1
+    return x * x + y * y
+
+
+def equirectangular_matrix(lat, lng, fence_lat, fence_lng) -> np.ndarray:
+    """N x M approximate distances in meters, accurate for short distances"""
+    squared = _equirectangular_squared(lat, lng, fence_lat, fence_lng)
+    return EARTH_RADIUS_METERS * np.sqrt(squared)
+
+
+def within(lat, lng, fence_lat, fence_lng, limits) -> np.ndarray:
+    """N x M mask of points lying within `limits` meters of each fence centre
+
+    `limits` broadcasts against the N x M result, typically one radius per
+    fence. When every limit is small the equirectangular fast path is used.
+    """
+    limits = np.asarray(limits, dtype=np.float64)
+    if limits.size and limits.max() <= FAST_PATH_MAX_METERS:
+        squared = _equirectangular_squared(lat, lng, fence_lat, fence_lng)
+        return squared <= (limits / EARTH_RADIUS_METERS) ** 2
+    return haversine_matrix(lat, lng, fence_lat, fence_lng) <= limits
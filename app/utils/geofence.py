@@ -0,0 +1,213 @@
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Type
+
+import numpy as np
+from tortoise.models import Model
+from tortoise.queryset import QuerySetSingle, ValuesListQuery
+
+from app.models.attendance import AttendanceEvent
+from app.models.location import Blacklist, LocationPing, Office, Residence
+from app.utils.dates import as_utc
+from app.utils.fence_index import Fence, FenceKey, fence_index
+from app.utils.geo import within
+from app.utils.memberships import load_roles
+
+
+@dataclass
+class Ping:
+    latitude: float
+    longitude: float
+    accuracy: float
+    timestamp: datetime
+
+
+@dataclass
+class Transition:
+    fence: Fence
+    event: str  # "enter" or "exit"
+    timestamp: datetime
+
+
+@dataclass
+class UserPosition:
+    latitude: float
+    longitude: float
+    accuracy: float
+    timestamp: datetime
+    inside: Dict[FenceKey, Fence] = field(default_factory=dict)
+
+
+@dataclass
+class FenceRoles:
+    """Which indexed fences apply to a user besides their own locations"""
+
+    office_ids: Set[int]
+    residence_ids: Set[int]
+    blacklist_ids: Set[int]
+    group_ids: Set[int]
+
+
+# Latest known position and occupied fences per user id
+positions: Dict[int, UserPosition] = {}
+
+
+def fence_role_query(model: Type[Model], user_id: int) -> ValuesListQuery:
+    return model.filter(user_id=user_id).values_list("location_id", flat=True)
+
+
+async def load_fence_roles(user_id: int) -> FenceRoles:
+    """Load a user's fence roles with a fixed number of queries"""
+    office_ids, residence_ids, blacklist_ids = [
+        set(await fence_role_query(model, user_id))
+        for model in (Office, Residence, Blacklist)
+    ]
+    group_ids = set(await load_roles(user_id))
+    return FenceRoles(office_ids, residence_ids, blacklist_ids, group_ids)
+
+
+def user_fences_near(
+    user_id: int,
+    roles: FenceRoles,
+    latitude: float,
+    longitude: float,
+    slack: float,
+    at: datetime,
+) -> List[Fence]:
+    """Fences of a user that could contain the point, from the spatial index"""
+    fences = []
+    for fence in fence_index.query_point(latitude, longitude, slack):
+        if fence.kind == "location":
+            if fence.owner_id == user_id:
+                fences.append(fence)
+            for kind, ids in (
+                ("office", roles.office_ids),
+                ("residence", roles.residence_ids),
+                ("blacklist", roles.blacklist_ids),
+            ):
+                if fence.id in ids:
+                    fences.append(replace(fence, kind=kind))
+        elif fence.kind == "event" and fence.owner_id in roles.group_ids:
+            if fence.start_time <= at <= fence.end_time:
+                fences.append(fence)
+    return fences
+
+
+def latest_ping(user_id: int) -> QuerySetSingle[Optional[LocationPing]]:
+    return LocationPing.filter(user_id=user_id).order_by("-recorded_at").first()
+
+
+def latest_transition(
+    user_id: int, fence: Fence
+) -> QuerySetSingle[Optional[AttendanceEvent]]:
+    return (
+        AttendanceEvent.filter(
+            user_id=user_id, fence_kind=fence.kind, fence_id=fence.id
+        )
+        .order_by("-timestamp")
+        .first()
+    )
+
+
+async def load_position(user_id: int, roles: FenceRoles) -> Optional[UserPosition]:
+    """The user's latest position, read back from the DB if this worker's is old
+
+    A user's pings may be served by any worker, and `positions` only holds
+    what this one saw. The ping and attendance logs hold every worker's, as
+    of their writers' last flush. The user is inside the fences near the
+    latest logged ping whose last logged transition was an enter.
+    """
+    position = positions.get(user_id)
+    ping = await latest_ping(user_id)
+    if ping is None:
+        return position
+    timestamp = as_utc(ping.recorded_at)
+    if position is not None and position.timestamp >= timestamp:
+        return position
+
+    inside: Dict[FenceKey, Fence] = {}
+    near = user_fences_near(
+        user_id, roles, ping.latitude, ping.longitude, ping.accuracy, timestamp
+    )
+    for fence in near:
+        transition = await latest_transition(user_id, fence)
+        if transition is not None and transition.event == "enter":
+            inside[fence.key] = fence
+    position = UserPosition(
+        ping.latitude, ping.longitude, ping.accuracy, timestamp, inside
+    )
+    positions[user_id] = position
+    return position
+
+
+def evaluate_pings(
+    user_id: int, roles: FenceRoles, pings: List[Ping]
+) -> List[Transition]:
+    """Replay pings in time order and return every fence entered or exited
+
+    The whole sequence is checked against its candidate fences in one
+    vectorized pass; only the enter/exit bookkeeping walks ping by ping.
+    """
+    previous: Optional[UserPosition] = positions.get(user_id)
+    pings = sorted(pings, key=lambda ping: ping.timestamp)
+    if previous is not None:
+        # Out-of-order pings, a newer position already decided the state
+        pings = [ping for ping in pings if ping.timestamp >= previous.timestamp]
+    if not pings:
+        return []
+
+    was_inside = previous.inside if previous is not None else {}
+    fences: Dict[FenceKey, Fence] = dict(was_inside)
+    candidates: List[Set[FenceKey]] = []
+    for ping in pings:
+        near = user_fences_near(
+            user_id,
+            roles,
+            ping.latitude,
+            ping.longitude,
+            ping.accuracy,
+            ping.timestamp,
+        )
+        fences.update((fence.key, fence) for fence in near)
+        candidates.append({fence.key for fence in near})
+
+    keys = list(fences)
+    radius = np.array([fences[key].radius for key in keys], dtype=np.float64)
+    accuracy = np.array([ping.accuracy for ping in pings], dtype=np.float64)
+    possible = np.array(
+        [[key in near for key in keys] for near in candidates], dtype=bool
+    ).reshape(len(pings), len(keys))
+    coordinates = (
+        [ping.latitude for ping in pings],
+        [ping.longitude for ping in pings],
+        [fences[key].latitude for key in keys],
+        [fences[key].longitude for key in keys],
+    )
+    # Only leave a fence once clear of it by the reported accuracy,
+    # so GPS jitter on the boundary doesn't flap enter/exit
+    enters = within(*coordinates, radius) & possible
+    stays = within(*coordinates, radius + accuracy[:, None]) & possible
+
+    inside = np.array([key in was_inside for key in keys], dtype=bool)
+    transitions = []
+    for i, ping in enumerate(pings):
+        now_inside = np.where(inside, stays[i], enters[i])
+        transitions.extend(
+            Transition(fences[keys[j]], "exit", ping.timestamp)
+            for j in np.flatnonzero(inside & ~now_inside)
+        )
+        transitions.extend(
+            Transition(fences[keys[j]], "enter", ping.timestamp)
+            for j in np.flatnonzero(now_inside & ~inside)
+        )
+        inside = now_inside
+
+    last = pings[-1]
+    positions[user_id] = UserPosition(
+        last.latitude,
+        last.longitude,
+        last.accuracy,
+        last.timestamp,
+        {keys[j]: fences[keys[j]] for j in np.flatnonzero(inside)},
+    )
+    return transitions
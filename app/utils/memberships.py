@@ -0,0 +1,84 @@
+from typing import Dict, Optional
+
+from fastapi import Depends
+from tortoise.queryset import ValuesListQuery
+from tortoise.signals import post_delete, post_save
+
+from app.config import config
+from app.models.group import GroupMembership, MembershipRole
+from app.models.user import User
+from app.utils.auth import get_current_user
+from app.utils.cache import TTLCache
+
+# Group id -> role for each user id, so permission checks are dictionary lookups
+membership_cache = TTLCache(
+    maxsize=config.membership_cache_size, ttl=config.membership_cache_ttl
+)
+
+
+def roles_query(user_id: int) -> ValuesListQuery:
+    # Always from the primary: the result is cached and shared with write
+    # routes, so a lagging replica must not decide permissions
+    return (
+        GroupMembership.filter(user_id=user_id)
+        .using_db(GroupMembership._meta.db)
+        .values_list("group_id", "role")
+    )
+
+
+async def load_roles(user_id: int) -> Dict[int, MembershipRole]:
+    """All of a user's group roles, from the cache or a single query"""
+    roles = membership_cache.get(user_id)
+    if roles is None:
+        rows = await roles_query(user_id)
+        roles = {group_id: MembershipRole(role) for group_id, role in rows}
+        membership_cache.set(user_id, roles)
+    return roles
+
+
+async def is_member(group_id: int, user_id: int) -> bool:
+    return group_id in await load_roles(user_id)
+
+
+def invalidate_memberships(user_id: int) -> None:
+    membership_cache.pop(user_id)
+
+
+def invalidate_group(group_id: int) -> None:
+    membership_cache.pop_where(lambda _, roles: group_id in roles)
+
+
+# Bulk queryset deletes skip these, callers invalidate those explicitly
+@post_save(GroupMembership)
+async def _membership_saved(
+    sender, instance: GroupMembership, created, using_db, update_fields
+):
+    invalidate_memberships(instance.user_id)
+
+
+@post_delete(GroupMembership)
+async def _membership_deleted(sender, instance: GroupMembership, using_db):
+    invalidate_memberships(instance.user_id)
+
+
+class Memberships:
+    """The current user's group roles, loaded once per request"""
+
+    def __init__(self, user: User, roles: Dict[int, MembershipRole]):
+        self.user = user
+        self.roles = roles
+
+    def role(self, group_id: int) -> Optional[MembershipRole]:
+        return self.roles.get(group_id)
+
+    def is_member(self, group_id: int) -> bool:
+        return group_id in self.roles
+
+    def is_admin(self, group_id: int) -> bool:
+        return self.roles.get(group_id) == MembershipRole.ADMIN
+
+
+async def get_memberships(
+    current_user: User = Depends(get_current_user),
+) -> Memberships:
+    return Memberships(current_user, await load_roles(current_user.id))
@@ -0,0 +1,119 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet, ValuesQuery
+
+from app.config import config
+from app.utils.rows import fetch_rows
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque cursor for the sort key of the last row on a page"""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """The sort key values of a cursor, None for the first page"""
+    if cursor is None:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def page_limit(
+    limit: int = Query(
+        config.page_size_default, ge=1, le=config.page_size_max, description="Page size"
+    )
+) -> int:
+    return limit
+
+
+class Keyset:
+    """Cursor pagination over a column with the primary key as tie-breaker
+
+    Rows are ordered by (column, id), so every page picks up exactly after
+    the last row of the previous one no matter what was inserted since.
+    """
+
+    def __init__(
+        self,
+        column: str = "id",
+        descending: bool = False,
+        parse: Callable[[Any], Any] = int,
+    ):
+        self.column = column
+        self.descending = descending
+        self.parse = parse
+
+    @property
+    def _size(self) -> int:
+        return 1 if self.column == "id" else 2
+
+    def order_by(self) -> Tuple[str, ...]:
+        sign = "-" if self.descending else ""
+        if self.column == "id":
+            return (f"{sign}id",)
+        return (f"{sign}{self.column}", f"{sign}id")
+
+    def after(self, cursor: Optional[str]) -> Optional[Q]:
+        """Filter for the rows past a cursor, None for the first page"""
+        values = decode_cursor(cursor, self._size)
+        if values is None:
+            return None
+        op = "lt" if self.descending else "gt"
+        try:
+            last_id = int(values[-1])
+            if self.column == "id":
+                return Q(**{f"id__{op}": last_id})
+            value = self.parse(values[0])
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return Q(**{f"{self.column}__{op}": value}) | Q(
+            **{self.column: value, f"id__{op}": last_id}
+        )
+
+    def page(self, rows: List[dict], limit: int, response: Response) -> List[dict]:
+        """Trim rows fetched with `limit + 1` and announce the next cursor"""
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            values = [last["id"]]
+            if self.column != "id":
+                values.insert(0, last[self.column])
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*values)
+        return rows[:limit]
+
+    def query(
+        self,
+        query: QuerySet,
+        fields: Iterable[str],
+        cursor: Optional[str],
+        limit: int,
+    ) -> ValuesQuery:
+        """One page of `fields` from the query, plus a row telling if more follow"""
+        after = self.after(cursor)
+        if after is not None:
+            query = query.filter(after)
+        return query.order_by(*self.order_by()).limit(limit + 1).values(*fields)
+
+    async def fetch(
+        self, query: ValuesQuery, limit: int, response: Response
+    ) -> List[dict]:
+        """Rows of a page query, the next cursor in a header"""
+        return self.page(await fetch_rows(query), limit, response)
+
+
+def parse_datetime(value: Any) -> datetime:
+    return datetime.fromisoformat(value)
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[str, dict], None]
+
+
+class Subscription:
+    """One listener's bounded inbox; when full the oldest message is dropped"""
+
+    def __init__(self, topic: str, maxsize: int):
+        self.topic = topic
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, message: dict) -> None:
+        if self._queue.full():
+            # A slow reader loses old events rather than stalling publishers
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Next message, or None if nothing arrived within `timeout` seconds"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Backplane:
+    """Carries messages published on one worker to the brokers of all others
+
+    The publishing worker always delivers to its own subscribers directly,
+    so a backplane only has to reach the other processes.
+    """
+
+    async def start(self, deliver: Deliver) -> None:
+        pass
+
+    def send(self, topic: str, message: dict) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"kind": "local"}
+
+
+class PostgresBackplane(Backplane):
+    """Relays messages between workers over Postgres LISTEN/NOTIFY
+
+    Each worker holds one dedicated connection that listens on a shared
+    channel and sends its own queued messages in batches. Messages a worker
+    hears back from itself are skipped, it has delivered them already.
+    """
+
+    channel = "lifefence_pubsub"
+    # Postgres rejects NOTIFY payloads of 8000 bytes or more
+    max_payload = 7999
+    reconnect_interval = 5.0
+
+    def __init__(self, url: str, outbox_size: int):
+        # Tortoise URLs may use the "asyncpg" scheme, asyncpg wants postgresql
+        self.dsn = "postgresql://" + url.split("://", 1)[1]
+        self.origin = uuid.uuid4().hex
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=outbox_size)
+        self._deliver: Optional[Deliver] = None
+        self._connection = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _connect(self) -> None:
+        # Only needed when a Postgres backplane is configured
+        import asyncpg
+
+        self._connection = await asyncpg.connect(self.dsn)
+        await self._connection.add_listener(self.channel, self._on_notify)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            envelope = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed pub/sub payload")
+            return
+        if envelope.get("origin") == self.origin:
+            return
+        self.received += 1
+        self._deliver(envelope["topic"], envelope["message"])
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        await self._connect()
+        self._task = asyncio.create_task(self._run())
+
+    def send(self, topic: str, message: dict) -> None:
+        payload = json.dumps(
+            {"origin": self.origin, "topic": topic, "message": message}
+        )
+        if len(payload.encode()) > self.max_payload:
+            self.dropped += 1
+            logger.warning("Pub/sub message on %s too large to relay", topic)
+            return
+        try:
+            self._outbox.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                payload = await asyncio.wait_for(
+                    self._outbox.get(), timeout=self.reconnect_interval
+                )
+            except asyncio.TimeoutError:
+                payload = None
+
+            if self._connection is None or self._connection.is_closed():
+                # A dropped connection also loses the listener, so idle
+                # workers have to notice and reconnect on their own
+                try:
+                    await self._connect()
+                    self.reconnects += 1
+                except Exception:
+                    logger.exception("Pub/sub backplane reconnect failed")
+                    if payload is not None:
+                        self.dropped += 1
+                    continue
+            if payload is None:
+                continue
+
+            batch: List[str] = [payload]
+            while not self._outbox.empty():
+                batch.append(self._outbox.get_nowait())
+            try:
+                await self._connection.executemany(
+                    "SELECT pg_notify($1, $2)",
+                    [(self.channel, payload) for payload in batch],
+                )
+                self.sent += len(batch)
+            except Exception:
+                self.dropped += len(batch)
+                logger.exception("Failed to relay %d pub/sub messages", len(batch))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+        self._connection = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": "postgres",
+            "sent": self.sent,
+            "received": self.received,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+            "outbox": self._outbox.qsize(),
+        }
+
+
+def make_backplane(url: str) -> Backplane:
+    scheme = url.split("://", 1)[0]
+    if scheme in ("", "memory"):
+        return Backplane()
+    if scheme in ("postgres", "postgresql", "asyncpg"):
+        return PostgresBackplane(url, config.pubsub_outbox_size)
+    raise ValueError(f"Unsupported pub/sub backplane: {scheme}")
+
+
+class Broker:
+    """Topic fan-out to any number of idle subscribers on this worker
+
+    Published messages are also handed to the backplane so subscribers
+    attached to other workers receive them too.
+    """
+
+    def __init__(self, buffer_size: int, backplane: Backplane):
+        self.buffer_size = buffer_size
+        self.backplane = backplane
+        self.published = 0
+        self.dropped = 0
+        self._topics: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(topic, self.buffer_size)
+        self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.dropped += subscription.dropped
+        subscribers = self._topics.get(subscription.topic)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._topics[subscription.topic]
+
+    def _deliver(self, topic: str, message: dict) -> None:
+        for subscription in self._topics.get(topic, ()):
+            subscription.deliver(message)
+
+    def publish(self, topic: str, message: dict) -> None:
+        self.published += 1
+        self._deliver(topic, message)
+        self.backplane.send(topic, message)
+
+    async def start(self) -> None:
+        await self.backplane.start(self._deliver)
+
+    async def stop(self) -> None:
+        await self.backplane.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        subscribers = [s for subs in self._topics.values() for s in subs]
+        return {
+            "topics": len(self._topics),
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "dropped": self.dropped + sum(s.dropped for s in subscribers),
+            "backplane": self.backplane.stats(),
+        }
+
+
+broker = Broker(config.pubsub_buffer_size, make_backplane(config.pubsub_url))
+
+
+class IndexSync:
+    """Keeps a worker's in-memory index in step with changes made on others
+
+    Subclasses apply one change heard on `topic` and rebuild the whole index
+    from the database. The worker that made a change has already applied
+    it, so the copy it hears back is applied a second time, which changes
+    nothing. `tick` runs at least every `interval` seconds.
+    """
+
+    topic: str
+    interval = 60.0
+
+    def __init__(self):
+        self.applied = 0
+        self.rebuilds = 0
+        self._seen_dropped = 0
+        self._subscription: Optional[Subscription] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def apply(self, message: dict) -> None:
+        raise NotImplementedError
+
+    async def rebuild(self) -> None:
+        raise NotImplementedError
+
+    def tick(self) -> None:
+        pass
+
+    def start(self) -> None:
+        if self._task is None:
+            self._subscription = broker.subscribe(self.topic)
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            message = await self._subscription.get(timeout=self.interval)
+            try:
+                if self._subscription.dropped > self._seen_dropped:
+                    # Changes were lost while the inbox was full; start over
+                    self._seen_dropped = self._subscription.dropped
+                    await self.rebuild()
+                    self.rebuilds += 1
+                elif message is not None:
+                    self.apply(message)
+                    self.applied += 1
+            except Exception:
+                logger.exception("Failed to apply a change on %s", self.topic)
+            self.tick()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._subscription is not None:
+            broker.unsubscribe(self._subscription)
+            self._subscription = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"applied": self.applied, "rebuilds": self.rebuilds}
+
+
+def group_topic(group_id: int) -> str:
+    return f"group:{group_id}"
+
+
+def publish_group(group_id: int, type: str, data: Any) -> None:
+    broker.publish(group_topic(group_id), {"type": type, "data": data})
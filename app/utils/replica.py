@@ -0,0 +1,88 @@
+import hashlib
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import Depends, Request
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import config
+from app.models.user import User
+from app.utils.auth import get_current_user
+from app.utils.cache import TTLCache
+
+REPLICA = "replica"
+
+# Clients that must see their own writes from another worker send this
+READ_PRIMARY_HEADER = "X-Read-Primary"
+
+# Digest of the caller's Authorization header for the current request
+_session: ContextVar[Optional[bytes]] = ContextVar("db_session", default=None)
+# Whether the current request's reads may go to the replica
+_use_replica: ContextVar[bool] = ContextVar("db_use_replica", default=False)
+
+# Sessions that wrote recently; their reads stay on the primary until the
+# replica has caught up. One entry per token, so bounded like the token cache.
+recent_writers = TTLCache(
+    maxsize=config.token_cache_size, ttl=config.replica_sticky_seconds
+)
+
+
+# Reads of opted-in requests by where they went; Tortoise builds the router itself
+routed = {"replica_reads": 0, "primary_reads": 0}
+
+
+class ReplicaRouter:
+    """Tortoise router sending reads of opted-in requests to the replica"""
+
+    def db_for_read(self, model) -> Optional[str]:
+        if not _use_replica.get():
+            return None
+        session = _session.get()
+        if session is not None and recent_writers.get(session) is not None:
+            routed["primary_reads"] += 1
+            return None
+        routed["replica_reads"] += 1
+        return REPLICA
+
+    def db_for_write(self, model) -> Optional[str]:
+        session = _session.get()
+        if session is not None:
+            recent_writers.set(session, True)
+        return None
+
+
+class DatabaseSessionMiddleware:
+    """Tags each request with its caller so writes can pin later reads"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        auth = Headers(scope=scope).get("authorization")
+        session = _session.set(hashlib.sha256(auth.encode()).digest() if auth else None)
+        use_replica = _use_replica.set(False)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _use_replica.reset(use_replica)
+            _session.reset(session)
+
+
+async def read_replica(
+    request: Request, current_user: User = Depends(get_current_user)
+) -> None:
+    """Route the rest of a read-only request to the replica
+
+    Depends on the current user so authentication itself still reads the
+    primary; a token issued moments ago may not have replicated yet.
+    """
+    if request.headers.get(READ_PRIMARY_HEADER) is None:
+        _use_replica.set(True)
+
+
+def stats() -> Dict[str, int]:
+    return {**routed, "recent_writers": len(recent_writers)}
@@ -0,0 +1,29 @@
+from typing import List, Optional, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+
+class RowList:
+    """Precompiled JSON encoder for the rows of a list endpoint
+
+    Validates plain rows against the route's response model and writes the
+    JSON in one pass inside pydantic-core. FastAPI would instead build the
+    list in Python, re-serialize it to dicts and encode those again. The
+    bytes are the same, and the route keeps its response_model for the docs.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.adapter = TypeAdapter(List[model])
+
+    def render(self, rows: List[dict]) -> bytes:
+        return self.adapter.dump_json(self.adapter.validate_python(rows))
+
+    def response(
+        self, rows: List[dict], response: Optional[Response] = None
+    ) -> Response:
+        """The rows as a JSON response, keeping headers set on `response`"""
+        headers = dict(response.headers) if response is not None else None
+        return Response(
+            self.render(rows), media_type="application/json", headers=headers
+        )
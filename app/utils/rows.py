@@ -0,0 +1,15 @@
+from typing import List
+
+from tortoise.queryset import ValuesQuery
+
+
+async def fetch_rows(query: ValuesQuery) -> List[dict]:
+    """Rows of a values() query exactly as the database driver returns them
+
+    Skips the ORM's per-value conversion, which dominates the cost of large
+    lists. Only use it for rows that a pydantic response model validates
+    anyway, since that already parses datetimes and 0/1 booleans.
+    """
+    # Same connection and SQL the query itself would execute with
+    db = query._choose_db()
+    return await db.execute_query_dict(query.sql())
@@ -0,0 +1,207 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import UTC, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from app.config import config
+from app.models.actions import Action
+from app.utils.action_index import (
+    ACTION_TOPIC,
+    action_index,
+    apply_action_message,
+    claim_action,
+    rebuild_action_index,
+    release_action,
+)
+from app.utils.dates import as_utc
+from app.utils.geofence import positions
+from app.utils.metrics import LatencyStats
+from app.utils.pubsub import IndexSync
+from app.utils.triggers import triggers
+
+logger = logging.getLogger(__name__)
+
+# (due, tie-breaker, boundary, action_id), boundary is "start" or "end"
+Timer = Tuple[datetime, int, str, int]
+
+
+class ActionScheduler:
+    """Fires actions when their window is open and the user is at the location
+
+    Window boundaries sit in a timer heap; at each start boundary (and
+    whenever a ping enters a location) the user's latest known position is
+    checked, the action is claimed and queued for a bounded pool of workers
+    that hand it to the trigger registry. Actions without a registered
+    handler are never claimed here, they are left for the client to trigger.
+    """
+
+    # Seconds before an action whose handler is saturated is checked again
+    retry_interval = 1.0
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.dispatched = 0
+        self.released = 0
+        self.queue_lag = LatencyStats()
+        self._timers: List[Timer] = []
+        self._sequence = itertools.count()
+        self._wake = asyncio.Event()
+        self._jobs: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+
+    def schedule(self, action_id: int, start_time: datetime, end_time: datetime):
+        now = datetime.now(UTC)
+        for due, boundary in ((start_time, "start"), (end_time, "end")):
+            due = max(as_utc(due), now)
+            heapq.heappush(
+                self._timers, (due, next(self._sequence), boundary, action_id)
+            )
+        self._wake.set()
+
+    def notify_enter(self, user_id: int, location_ids: Iterable[int]) -> None:
+        """Check open actions right away for locations a user just entered"""
+        now = datetime.now(UTC)
+        for location_id in location_ids:
+            for action_id in action_index.open_actions(user_id, location_id, now):
+                heapq.heappush(
+                    self._timers, (now, next(self._sequence), "start", action_id)
+                )
+        self._wake.set()
+
+    async def dispatch(
+        self, action_id: int, due: Optional[datetime] = None, release: bool = False
+    ) -> None:
+        """Queue the handler of an already claimed action
+
+        With `release`, a claim whose handler can't take the action is undone
+        so the action can fire later.
+        """
+        await self._jobs.put((action_id, due or datetime.now(UTC), release))
+
+    async def _check(self, action_id: int, due: datetime) -> None:
+        entry = action_index.get(action_id)
+        if entry is None:
+            return  # used, deleted or closed meanwhile
+        (user_id, location_id), _ = entry
+
+        position = positions.get(user_id)
+        if position is None or not any(
+            kind != "event" and fence_id == location_id
+            for kind, fence_id in position.inside
+        ):
+            return
+
+        action = await Action.get_or_none(id=action_id)
+        spec = triggers.get(action.trigger_function) if action is not None else None
+        if spec is None:
+            return
+        if spec.saturated:
+            # Try again once the handler has caught up, without claiming
+            retry = datetime.now(UTC) + timedelta(seconds=self.retry_interval)
+            heapq.heappush(
+                self._timers, (retry, next(self._sequence), "start", action_id)
+            )
+            return
+
+        if await claim_action(action_id, at=datetime.now(UTC)):
+            await self.dispatch(action_id, due, release=True)
+
+    async def _run(self) -> None:
+        while True:
+            now = datetime.now(UTC)
+            while self._timers and self._timers[0][0] <= now:
+                due, _, boundary, action_id = heapq.heappop(self._timers)
+                try:
+                    if boundary == "start":
+                        await self._check(action_id, due)
+                    else:
+                        action_index.prune(now)
+                except Exception:
+                    logger.exception("Scheduler failed on action %d", action_id)
+
+            self._wake.clear()
+            timeout = None
+            if self._timers:
+                timeout = (self._timers[0][0] - now).total_seconds()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self) -> None:
+        while True:
+            action_id, due, release = await self._jobs.get()
+            try:
+                self.queue_lag.observe((datetime.now(UTC) - due).total_seconds())
+                action = await Action.get_or_none(id=action_id)
+                if action is None:
+                    continue
+                # Handlers run under their own limits, the worker moves straight on
+                if triggers.submit(action, due):
+                    self.dispatched += 1
+                elif release:
+                    await release_action(action)
+                    self.released += 1
+            except Exception:
+                logger.exception("Failed to dispatch action %d", action_id)
+            finally:
+                self._jobs.task_done()
+
+    def schedule_all(self) -> None:
+        for action_id, (_, (start_time, end_time, _)) in action_index.items():
+            self.schedule(action_id, start_time, end_time)
+
+    def start(self) -> None:
+        self.schedule_all()
+        self._tasks.append(asyncio.create_task(self._run()))
+        self._tasks.extend(
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        )
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def stats(self) -> dict:
+        return {
+            "timers": len(self._timers),
+            "queued": self._jobs.qsize(),
+            "dispatched": self.dispatched,
+            "released": self.released,
+            "queue_lag": self.queue_lag.stats(),
+        }
+
+
+scheduler = ActionScheduler(config.scheduler_workers, config.scheduler_queue_size)
+
+
+class ActionSync(IndexSync):
+    """Schedules every action saved on any worker, this one included
+
+    Every worker schedules every action and the claim decides which one
+    fires, so an action runs wherever the user's latest ping was served.
+    """
+
+    topic = ACTION_TOPIC
+
+    def apply(self, message: dict) -> None:
+        apply_action_message(message)
+        if message["type"] == "add":
+            entry = action_index.get(message["id"])
+            if entry is not None:
+                start_time, end_time, _ = entry[1]
+                scheduler.schedule(message["id"], start_time, end_time)
+
+    async def rebuild(self) -> None:
+        await rebuild_action_index()
+        scheduler.schedule_all()
+
+    def stats(self) -> dict:
+        return {"actions": len(action_index), **super().stats()}
+
+
+action_sync = ActionSync()
@@ -0,0 +1,66 @@
+from typing import Dict, List
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from app.models.task import Task
+
+# Positional parameter markers per SQL dialect
+PLACEHOLDERS = {
+    "postgres": lambda i: f"${i}",
+    "sqlite": lambda i: "?",
+    "mysql": lambda i: "%s",
+}
+
+SUBTREE_SQL = """
+WITH RECURSIVE subtree (id, depth) AS (
+    SELECT id, 0 FROM {table} WHERE id = {root} AND user_id = {user}
+    UNION ALL
+    SELECT child.id, subtree.depth + 1
+    FROM {table} child JOIN subtree ON child.parent_task_id = subtree.id
+    WHERE subtree.depth < {max_depth}
+)
+SELECT task.id, task.title, task.start_date, task.due_date, task.completed,
+       task.parent_task_id, task.location_id, task.user_id, subtree.depth
+FROM subtree JOIN {table} task ON task.id = subtree.id
+ORDER BY subtree.depth, task.id
+"""
+
+
+def _subtree_query(db: BaseDBAsyncClient) -> str:
+    mark = PLACEHOLDERS[db.capabilities.dialect]
+    return SUBTREE_SQL.format(
+        table=Task._meta.db_table, root=mark(1), user=mark(2), max_depth=mark(3)
+    )
+
+
+async def fetch_subtree(task_id: int, user_id: int, max_depth: int) -> List[dict]:
+    """A task and its descendants down to `max_depth` levels, in one query
+
+    Rows come breadth first with their depth below the root; an empty list
+    means the task doesn't exist or belongs to someone else.
+    """
+    db = Task.all()._choose_db()
+    return await db.execute_query_dict(
+        _subtree_query(db), [task_id, user_id, max_depth]
+    )
+
+
+def add_progress(rows: List[dict]) -> List[dict]:
+    """Count done and total tasks in each node's subtree, the node included
+
+    Only the returned rows are counted, so with a depth limit the nodes on
+    the last level don't account for what lies below them.
+    """
+    nodes: Dict[int, dict] = {}
+    for row in rows:
+        row["completed_count"] = 1 if row["completed"] else 0
+        row["total_count"] = 1
+        nodes[row["id"]] = row
+
+    # Deepest first, so every child is complete before it is added to its parent
+    for row in reversed(rows):
+        parent = nodes.get(row["parent_task_id"])
+        if parent is not None:
+            parent["completed_count"] += row["completed_count"]
+            parent["total_count"] += row["total_count"]
+    return rows
@@ -0,0 +1,178 @@
+import asyncio
+import importlib
+import logging
+import time
+from datetime import UTC, datetime
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from app.config import config
+from app.models.actions import Action
+from app.utils.metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+TriggerHandler = Callable[[Action], Awaitable[None]]
+
+
+class TriggerSpec:
+    """A registered handler with its own concurrency, timeout and retry policy"""
+
+    def __init__(
+        self,
+        name: str,
+        func: TriggerHandler,
+        concurrency: int,
+        timeout: float,
+        retries: int,
+        backoff: float,
+    ):
+        self.name = name
+        self.func = func
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        # Runs waiting for a slot before new submissions are shed
+        self.max_pending = concurrency * 64
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.retried = 0
+        self.rejected = 0
+        self.queue_lag = LatencyStats()
+        self.latency = LatencyStats()
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "retried": self.retried,
+            "rejected": self.rejected,
+            "queue_lag": self.queue_lag.stats(),
+            "latency": self.latency.stats(),
+        }
+
+
+class TriggerRegistry:
+    """Maps Action.trigger_function names to async handlers
+
+    Each handler runs under its own semaphore, so a slow one only backs up
+    its own work while every other handler keeps firing in parallel.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, TriggerSpec] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def register(
+        self,
+        name: str,
+        *,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+    ):
+        def decorator(func: TriggerHandler) -> TriggerHandler:
+            self._specs[name] = TriggerSpec(
+                name,
+                func,
+                concurrency or config.trigger_concurrency,
+                timeout or config.trigger_timeout,
+                config.trigger_retries if retries is None else retries,
+                config.trigger_backoff if backoff is None else backoff,
+            )
+            return func
+
+        return decorator
+
+    def resolve(self) -> None:
+        """Import handler plugins and set up their limits, once at startup"""
+        for module in config.trigger_modules:
+            importlib.import_module(module)
+        for spec in self._specs.values():
+            spec.semaphore = asyncio.Semaphore(spec.concurrency)
+        logger.info("Trigger handlers: %s", ", ".join(sorted(self._specs)))
+
+    def get(self, name: str) -> Optional[TriggerSpec]:
+        return self._specs.get(name)
+
+    def submit(self, action: Action, due: datetime) -> bool:
+        """Start an action's handler in the background, False if it can't run"""
+        spec = self._specs.get(action.trigger_function)
+        if spec is None or spec.semaphore is None:
+            logger.warning(
+                "No handler %r for action %d", action.trigger_function, action.id
+            )
+            return False
+        if spec.saturated:
+            spec.rejected += 1
+            logger.error(
+                "Handler %r saturated, dropped action %d", spec.name, action.id
+            )
+            return False
+
+        spec.pending += 1
+        task = asyncio.create_task(self._run(spec, action, due))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, spec: TriggerSpec, action: Action, due: datetime) -> None:
+        try:
+            for attempt in range(spec.retries + 1):
+                if attempt:
+                    spec.retried += 1
+                    await asyncio.sleep(spec.backoff * 2 ** (attempt - 1))
+
+                async with spec.semaphore:
+                    if not attempt:
+                        spec.queue_lag.observe(
+                            (datetime.now(UTC) - due).total_seconds()
+                        )
+                    started = time.perf_counter()
+                    try:
+                        await asyncio.wait_for(spec.func(action), timeout=spec.timeout)
+                    except asyncio.TimeoutError:
+                        spec.timeouts += 1
+                        logger.warning(
+                            "Handler %r timed out on action %d", spec.name, action.id
+                        )
+                        continue
+                    except Exception:
+                        logger.exception(
+                            "Handler %r failed on action %d", spec.name, action.id
+                        )
+                        continue
+                    finally:
+                        spec.latency.observe(time.perf_counter() - started)
+
+                spec.succeeded += 1
+                return
+            spec.failed += 1
+        finally:
+            spec.pending -= 1
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {name: spec.stats() for name, spec in self._specs.items()}
+
+
+triggers = TriggerRegistry()
+
+
+@triggers.register("log")
+async def log_trigger(action: Action) -> None:
+    logger.info("Action %d fired for user %d", action.id, action.user_id)
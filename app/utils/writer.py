@@ -0,0 +1,107 @@
+import asyncio
+import logging
+from typing import Iterable, List, Optional, Type
+
+from tortoise import Model
+
+from app.config import config
+from app.models.attendance import AttendanceEvent
+from app.models.location import LocationPing
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter:
+    """Collects rows in memory and bulk inserts them every N ms or N rows"""
+
+    def __init__(self, model: Type[Model], max_rows: int, interval_ms: int):
+        self.model = model
+        self.max_rows = max_rows
+        self.interval = interval_ms / 1000
+        # Rows kept while the database is unreachable before the oldest drop
+        self.max_pending = max_rows * 100
+        self.written = 0
+        self.dropped = 0
+        self._buffer: List[Model] = []
+        self._full = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, row: Model) -> None:
+        self._buffer.append(row)
+        if len(self._buffer) >= self.max_rows:
+            self._full.set()
+
+    def extend(self, rows: Iterable[Model]) -> None:
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.max_rows:
+            self._full.set()
+
+    async def flush(self) -> None:
+        while self._buffer:
+            rows = self._buffer[: self.max_rows]
+            del self._buffer[: self.max_rows]
+            try:
+                await self.model.bulk_create(rows)
+            except Exception:
+                logger.exception("Failed to write %d %s rows", len(rows), self.model)
+                # Put them back for the next tick, bounded so memory can't grow forever
+                self._buffer[:0] = rows
+                overflow = len(self._buffer) - self.max_pending
+                if overflow > 0:
+                    del self._buffer[:overflow]
+                    self.dropped += overflow
+                self._full.clear()
+                return
+            self.written += len(rows)
+        self._full.clear()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Wake the loop and let it finish rather than cancelling it: a batch
+        # being inserted is already out of the buffer and would be lost
+        if self._task is not None:
+            self._stopping = True
+            self._full.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+ping_writer = BufferedWriter(
+    LocationPing, config.write_batch_rows, config.write_batch_interval_ms
+)
+attendance_writer = BufferedWriter(
+    AttendanceEvent, config.write_batch_rows, config.write_batch_interval_ms
+)
+writers = (ping_writer, attendance_writer)
+
+
+def start_writers() -> None:
+    for writer in writers:
+        writer.start()
+
+
+async def stop_writers() -> None:
+    """Stop the flush loops and write out anything still buffered"""
+    for writer in writers:
+        await writer.stop()
@@ -0,0 +1,122 @@
+"""Latency of an unrelated endpoint while a burst of logins hashes passwords
+
+    poetry run python -m benchmarks.login_latency [--logins 200] [--inline]
+
+Runs the app in process against a throwaway SQLite database. One client
+polls /api/location/view/all while the logins run concurrently. --inline
+verifies passwords on the event loop, as before the worker pool, for
+comparison.
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import httpx
+
+from app.config import config
+from app.main import app, app_lifespan
+from app.utils import auth
+
+PASSWORD = "benchmark-password"
+
+
+async def _hash_inline(func, *args):
+    return func(*args)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+async def probe(client: httpx.AsyncClient, token: str, count: int) -> List[float]:
+    """Request timings in milliseconds, one request after another"""
+    headers = {"Authorization": f"Bearer {token}"}
+    timings = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = await client.get("/api/location/view/all", headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+        await asyncio.sleep(0.005)
+    return timings
+
+
+async def logins(client: httpx.AsyncClient, count: int) -> None:
+    started = time.perf_counter()
+    responses = await asyncio.gather(
+        *(
+            client.post(
+                "/api/auth/login", json={"username": "bench", "password": PASSWORD}
+            )
+            for _ in range(count)
+        )
+    )
+    statuses = [response.status_code for response in responses]
+    print(
+        f"logins: {statuses.count(200)} ok, {statuses.count(429)} rejected (429)"
+        f" in {time.perf_counter() - started:.1f} s"
+    )
+
+
+def report(name: str, timings: List[float]) -> None:
+    print(
+        f"{name:<16} n={len(timings):<5} p50={statistics.median(timings):7.1f} ms"
+        f"  p99={percentile(timings, 0.99):7.1f} ms  max={max(timings):7.1f} ms"
+    )
+
+
+async def run(login_count: int, probes: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with app_lifespan(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        response = await client.post(
+            "/api/auth/signup",
+            json={
+                "username": "bench",
+                "name": "Bench",
+                "email": "bench@example.com",
+                "password": PASSWORD,
+                "dob": "2000-01-01",
+            },
+        )
+        response.raise_for_status()
+        response = await client.post(
+            "/api/auth/login", json={"username": "bench", "password": PASSWORD}
+        )
+        token = response.json()["access_token"]
+
+        report("idle", await probe(client, token, probes))
+
+        timings, _ = await asyncio.gather(
+            probe(client, token, probes), logins(client, login_count)
+        )
+        report(f"{login_count} logins", timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument(
+        "--inline", action="store_true", help="hash on the event loop instead"
+    )
+    args = parser.parse_args()
+
+    if args.inline:
+        auth._run_hash_job = _hash_inline
+    with tempfile.TemporaryDirectory() as directory:
+        config.database_url = f"sqlite://{Path(directory) / 'bench.db'}"
+        config.database_read_url = ""
+        config.migrate_on_start = True
+        asyncio.run(run(args.logins, args.probes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""decode_token throughput with and without the verified-token cache
+
+    poetry run python -m benchmarks.token_decode [--decodes 20000] [--tokens 1000]
+
+Decodes `--tokens` distinct bearer tokens round-robin, as a crowd of polling
+clients would. Uncached runs set the cache size to zero.
+"""
+
+import argparse
+import time
+from datetime import timedelta
+
+from app.utils.auth import create_access_token, decode_token, token_cache
+
+
+def measure(tokens, decodes: int, maxsize: int) -> float:
+    """Decodes per second with the cache bounded to `maxsize` entries"""
+    token_cache.clear()
+    token_cache.maxsize = maxsize
+    started = time.perf_counter()
+    for i in range(decodes):
+        decode_token(tokens[i % len(tokens)])
+    return decodes / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--decodes", type=int, default=20_000)
+    parser.add_argument("--tokens", type=int, default=1_000)
+    args = parser.parse_args()
+
+    tokens = [
+        create_access_token({"sub": f"user{i}", "uid": i}, timedelta(hours=12))
+        for i in range(args.tokens)
+    ]
+    maxsize = token_cache.maxsize
+    uncached = measure(tokens, args.decodes, 0)
+    cached = measure(tokens, args.decodes, maxsize)
+    print(f"uncached  {uncached:10,.0f} decodes/s")
+    print(f"cached    {cached:10,.0f} decodes/s  ({cached / uncached:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+import pytest
+from tortoise import Tortoise
+
+from app.config import config
+from app.migrations import migrate
+from app.utils.database import init_db
+
+
+@pytest.fixture
+def database_url(tmp_path, monkeypatch) -> str:
+    """A fresh SQLite file, set as DATABASE_URL for the app"""
+    url = f"sqlite://{tmp_path / 'test.db'}"
+    monkeypatch.setattr(config, "database_url", url)
+    monkeypatch.setattr(config, "database_read_url", "")
+    return url
+
+
+@pytest.fixture
+async def db(database_url):
+    """Tortoise connected to a freshly migrated database"""
+    await init_db()
+    await migrate()
+    yield Tortoise.get_connection("default")
+    await Tortoise.close_connections()
@@ -0,0 +1,125 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import UTC, datetime, timedelta
+from typing import List, Tuple
+
+from tortoise import Tortoise
+
+from app.config import config
+from app.models import Action, Location, User
+from app.utils.action_index import claim_action
+from app.utils.database import init_db
+
+ACTIONS = 10
+CLAIMS = 50
+PROCESSES = 4
+# Per process and action, 2000 claims in all
+PROCESS_CLAIMS = 50
+
+
+async def create_user(name: str) -> User:
+    return await User.create(
+        username=name,
+        name=name,
+        email=f"{name}@example.com",
+        password="x",
+        dob="2000-01-01",
+    )
+
+
+async def create_actions(count: int) -> List[int]:
+    user = await create_user("u")
+    location = await Location.create(latitude=1.0, longitude=2.0, user=user)
+    now = datetime.now(UTC)
+    actions = [
+        await Action.create(
+            trigger_function="notify",
+            location=location,
+            user=user,
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+        )
+        for _ in range(count)
+    ]
+    return [action.id for action in actions]
+
+
+async def test_parallel_claims_fire_each_action_once(db):
+    action_ids = await create_actions(ACTIONS)
+
+    results = await asyncio.gather(
+        *(claim_action(action_id) for action_id in action_ids for _ in range(CLAIMS))
+    )
+
+    winners = [
+        action_id
+        for action_id, won in zip(
+            (action_id for action_id in action_ids for _ in range(CLAIMS)), results
+        )
+        if won
+    ]
+    assert sorted(winners) == action_ids
+    assert await Action.filter(used=True).count() == ACTIONS
+
+
+async def test_claim_respects_owner_and_window(db):
+    action_id, late_id = await create_actions(2)
+    other = await create_user("other")
+    await Action.filter(id=late_id).update(
+        start_time=datetime.now(UTC) + timedelta(hours=2)
+    )
+
+    assert not await claim_action(action_id, user_id=other.id)
+    assert not await claim_action(late_id)
+    assert await claim_action(action_id)
+    assert not await claim_action(action_id)
+
+
+def _claim_all(url: str, action_ids: List[int]) -> Tuple[List[int], float, float]:
+    """Action ids this process won, and when its claims started and ended"""
+
+    # Each process has its own connection, as each worker of a deployment does
+    async def run() -> Tuple[List[int], float, float]:
+        config.database_url = url
+        await init_db()
+        # Interleaved, so every action is contended throughout
+        claims = [action_id for _ in range(PROCESS_CLAIMS) for action_id in action_ids]
+        try:
+            started = time.time()
+            results = await asyncio.gather(*(claim_action(i) for i in claims))
+            ended = time.time()
+        finally:
+            await Tortoise.close_connections()
+        won = [action_id for action_id, won in zip(claims, results) if won]
+        return won, started, ended
+
+    return asyncio.run(run())
+
+
+async def test_claims_from_several_processes_fire_each_action_once(
+    db, database_url, capsys
+):
+    action_ids = await create_actions(ACTIONS)
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(PROCESSES, mp_context=context) as pool:
+        futures = [
+            asyncio.wrap_future(pool.submit(_claim_all, database_url, action_ids))
+            for _ in range(PROCESSES)
+        ]
+        results = await asyncio.gather(*futures)
+
+    won = sorted(action_id for ids, _, _ in results for action_id in ids)
+    assert won == action_ids
+    assert await Action.filter(used=True).count() == ACTIONS
+
+    claims = PROCESSES * ACTIONS * PROCESS_CLAIMS
+    started = min(started for _, started, _ in results)
+    elapsed = max(ended for _, _, ended in results) - started
+    with capsys.disabled():
+        print(
+            f"\n{claims} claims from {PROCESSES} processes in {elapsed:.2f} s,"
+            f" {claims / elapsed:,.0f} claims/s"
+        )
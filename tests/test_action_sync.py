@@ -0,0 +1,40 @@
+from datetime import UTC, datetime, timedelta
+
+from app.models import Action, Location, User
+from app.utils.action_index import ACTION_TOPIC, action_index, claim_action
+from app.utils.pubsub import broker
+from app.utils.scheduler import ActionSync, scheduler
+
+
+async def test_action_changes_reach_other_workers(db):
+    user = await User.create(
+        username="u", name="u", email="u@example.com", password="x", dob="2000-01-01"
+    )
+    location = await Location.create(latitude=1.0, longitude=2.0, user=user)
+    subscription = broker.subscribe(ACTION_TOPIC)
+    try:
+        now = datetime.now(UTC)
+        action = await Action.create(
+            trigger_function="log",
+            location=location,
+            user=user,
+            start_time=now - timedelta(minutes=1),
+            end_time=now + timedelta(hours=1),
+        )
+        added = await subscription.get(timeout=1)
+        assert await claim_action(action.id)
+        removed = await subscription.get(timeout=1)
+    finally:
+        broker.unsubscribe(subscription)
+
+    # Another worker's index, which has seen neither change
+    action_index.clear()
+    timers = scheduler.stats()["timers"]
+    sync = ActionSync()
+
+    sync.apply(added)
+    assert action_index.open_actions(user.id, location.id) == [action.id]
+    assert scheduler.stats()["timers"] == timers + 2
+
+    sync.apply(removed)
+    assert action_index.open_actions(user.id, location.id) == []
@@ -0,0 +1,78 @@
+from datetime import UTC, date, datetime
+from zoneinfo import ZoneInfo
+
+from app.models import AttendanceRollup, User
+from app.utils import attendance
+from app.utils.attendance import split_by_day, update_rollups
+from app.utils.fence_index import Fence
+from app.utils.geofence import Transition
+
+OFFICE = Fence("office", 1, 0.0, 0.0, 100)
+
+
+def at(day: int, hour: int) -> datetime:
+    return datetime(2024, 1, day, hour, tzinfo=UTC)
+
+
+def test_split_by_day_across_midnight():
+    assert list(split_by_day(at(1, 22), datetime(2024, 1, 2, 1, 30, tzinfo=UTC))) == [
+        (date(2024, 1, 1), 7200),
+        (date(2024, 1, 2), 5400),
+    ]
+    assert list(split_by_day(at(1, 8), at(1, 12))) == [(date(2024, 1, 1), 14400)]
+    assert list(split_by_day(at(1, 12), at(1, 12))) == []
+
+
+def test_split_by_day_uses_the_local_midnight(monkeypatch):
+    monkeypatch.setattr(attendance, "timezone", ZoneInfo("Asia/Kolkata"))
+
+    # 18:30 UTC is midnight in UTC+05:30
+    assert list(split_by_day(at(1, 17), at(1, 20))) == [
+        (date(2024, 1, 1), 5400),
+        (date(2024, 1, 2), 5400),
+    ]
+
+
+async def create_user():
+    return await User.create(
+        username="u", name="u", email="u@example.com", password="x", dob="2000-01-01"
+    )
+
+
+async def rollups(user):
+    return {
+        rollup.day: rollup
+        for rollup in await AttendanceRollup.filter(user=user).order_by("day")
+    }
+
+
+async def test_repeated_enter_keeps_the_open_stay(db):
+    user = await create_user()
+
+    await update_rollups(user.id, 0, [Transition(OFFICE, "enter", at(1, 8))])
+    # A worker that lost track of the user sees them enter again
+    await update_rollups(user.id, 0, [Transition(OFFICE, "enter", at(1, 10))])
+    await update_rollups(user.id, 1, [Transition(OFFICE, "exit", at(1, 12))])
+
+    (rollup,) = (await rollups(user)).values()
+    assert rollup.dwell_seconds == 14400
+    assert rollup.first_in == at(1, 8)
+    assert rollup.last_out == at(1, 12)
+    assert rollup.inside_since is None
+
+
+async def test_stay_across_midnight_is_split(db):
+    user = await create_user()
+
+    await update_rollups(user.id, 0, [Transition(OFFICE, "enter", at(1, 22))])
+    await update_rollups(user.id, 0, [Transition(OFFICE, "enter", at(2, 1))])
+    await update_rollups(user.id, 1, [Transition(OFFICE, "exit", at(2, 2))])
+
+    days = await rollups(user)
+    assert {day: r.dwell_seconds for day, r in days.items()} == {
+        date(2024, 1, 1): 7200,
+        date(2024, 1, 2): 7200,
+    }
+    assert days[date(2024, 1, 1)].first_in == at(1, 22)
+    assert days[date(2024, 1, 2)].last_out == at(2, 2)
+    assert all(r.inside_since is None for r in days.values())
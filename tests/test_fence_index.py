@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+from app.utils.fence_index import Fence, FenceIndex
+from app.utils.geo import haversine, within
+
+
+def random_fences(rng, count, lat=(-60, 60), lng=(-180, 180)):
+    return [
+        Fence(
+            "location",
+            i,
+            rng.uniform(*lat),
+            rng.uniform(*lng),
+            # Mostly small, a few too large to bucket
+            rng.choice([50, 100, 500, 2_000, 5_000]),
+        )
+        for i in range(count)
+    ]
+
+
+def brute_force(fences, latitude, longitude, slack):
+    mask = within(
+        latitude,
+        longitude,
+        [f.latitude for f in fences],
+        [f.longitude for f in fences],
+        [f.radius + slack for f in fences],
+    )[0]
+    return {f.key for f, hit in zip(fences, mask) if hit}
+
+
+@pytest.mark.parametrize("slack", [0, 20, 1_000, 4_000, 5_000])
+def test_query_point_matches_brute_force(slack):
+    rng = random.Random(slack)
+    # Dense enough around a few spots that most queries hit something
+    fences = []
+    for lat, lng in [(12.97, 79.16), (59.9, 10.7), (-33.9, 151.2), (0.0, 179.99)]:
+        fences += random_fences(
+            rng, 500, (lat - 0.1, lat + 0.1), (lng - 0.1, lng + 0.1)
+        )
+    fences = [
+        Fence(f.kind, i, f.latitude, f.longitude, f.radius)
+        for i, f in enumerate(fences)
+    ]
+    index = FenceIndex()
+    index.rebuild(fences)
+
+    for fence in rng.sample(fences, 200):
+        latitude = fence.latitude + rng.uniform(-0.05, 0.05)
+        longitude = (fence.longitude + rng.uniform(-0.05, 0.05) + 180) % 360 - 180
+
+        found = {f.key for f in index.query_point(latitude, longitude, slack)}
+
+        assert found == brute_force(fences, latitude, longitude, slack)
+
+
+def test_coarse_queries_do_not_scan_every_fence(monkeypatch):
+    rng = random.Random(1)
+    fences = [
+        Fence("location", i, rng.uniform(-60, 60), rng.uniform(-180, 180), 100)
+        for i in range(20_000)
+    ]
+    index = FenceIndex()
+    index.rebuild(fences)
+    checked = []
+
+    def counting_within(lat, lng, fence_lat, fence_lng, limits):
+        checked.append(len(fence_lat))
+        return within(lat, lng, fence_lat, fence_lng, limits)
+
+    monkeypatch.setattr("app.utils.fence_index.within", counting_within)
+    index.query_point(12.97, 79.16, 10_000)
+
+    # The 10 km box covers a few hundred cells and a handful of fences
+    assert checked[0] < 100
+
+
+def test_fences_across_the_antimeridian():
+    index = FenceIndex()
+    east = Fence("location", 1, 10.0, 179.9999, 100)
+    west = Fence("location", 2, 10.0, -179.9999, 100)
+    index.rebuild([east, west])
+
+    # 22 m apart across the antimeridian
+    assert haversine(10.0, -179.9999, 10.0, 179.9999) < 25
+    assert {f.key for f in index.query_point(10.0, -179.9999)} == {east.key, west.key}
+    assert {f.key for f in index.query_point(10.0, 179.9999, 50)} == {
+        east.key,
+        west.key,
+    }
+    assert [f.key for _, f in index.nearest(10.0, -179.99995, 2)] == [
+        west.key,
+        east.key,
+    ]
+    assert [f.key for _, f in index.query_radius(10.0, 179.99995, 100)] == [
+        east.key,
+        west.key,
+    ]
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(2)
+    fences = random_fences(rng, 2_000)
+    index = FenceIndex()
+    index.rebuild(fences)
+
+    for _ in range(50):
+        latitude, longitude = rng.uniform(-60, 60), rng.uniform(-180, 180)
+        expected = sorted(
+            fences,
+            key=lambda f: haversine(latitude, longitude, f.latitude, f.longitude),
+        )[:5]
+
+        found = [f.key for _, f in index.nearest(latitude, longitude, 5)]
+
+        assert found == [f.key for f in expected]
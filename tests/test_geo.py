@@ -0,0 +1,93 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from app.utils.geo import (
+    EARTH_RADIUS_METERS,
+    FAST_PATH_MAX_METERS,
+    haversine,
+    haversine_matrix,
+    within,
+)
+
+
+def destination(lat: float, lng: float, bearing: float, meters: float):
+    """The point `meters` away from (lat, lng) along `bearing` degrees"""
+    phi1 = math.radians(lat)
+    lambda1 = math.radians(lng)
+    theta = math.radians(bearing)
+    delta = meters / EARTH_RADIUS_METERS
+    phi2 = math.asin(
+        math.sin(phi1) * math.cos(delta)
+        + math.cos(phi1) * math.sin(delta) * math.cos(theta)
+    )
+    lambda2 = lambda1 + math.atan2(
+        math.sin(theta) * math.sin(delta) * math.cos(phi1),
+        math.cos(delta) - math.sin(phi1) * math.sin(phi2),
+    )
+    # Back into -180..180
+    lng2 = (math.degrees(lambda2) + 540) % 360 - 180
+    return math.degrees(phi2), lng2
+
+
+def test_haversine_matrix_matches_scalar():
+    rng = random.Random(1)
+    points = [(rng.uniform(-89, 89), rng.uniform(-180, 180)) for _ in range(50)]
+    fences = [(rng.uniform(-89, 89), rng.uniform(-180, 180)) for _ in range(40)]
+
+    matrix = haversine_matrix(
+        [p[0] for p in points],
+        [p[1] for p in points],
+        [f[0] for f in fences],
+        [f[1] for f in fences],
+    )
+
+    assert matrix.shape == (50, 40)
+    expected = np.array([[haversine(*p, *f) for f in fences] for p in points])
+    np.testing.assert_allclose(matrix, expected, rtol=1e-9, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "limit",
+    [50, 1_000, FAST_PATH_MAX_METERS, FAST_PATH_MAX_METERS + 1, 50_000],
+)
+def test_within_matches_scalar_haversine(limit):
+    # Either side of the 10 km cutoff between the fast and the exact path
+    rng = random.Random(limit)
+    for _ in range(200):
+        fence = (rng.uniform(-60, 60), rng.uniform(-180, 180))
+        # Just inside and just outside the limit; the fast path is within 0.1%
+        factor = rng.choice([0.995, 1.005])
+        point = destination(*fence, rng.uniform(0, 360), limit * factor)
+
+        mask = within(point[0], point[1], [fence[0]], [fence[1]], [limit])
+
+        assert mask.shape == (1, 1)
+        assert bool(mask[0, 0]) == (haversine(*point, *fence) <= limit)
+
+
+def test_within_across_antimeridian():
+    fence = (10.0, 179.99)
+    near = (10.0, -179.995)  # about 1.6 km east, across the antimeridian
+    far = (10.0, -179.9)  # about 11.5 km east
+
+    assert haversine(*near, *fence) < 2_000
+    mask = within([near[0], far[0]], [near[1], far[1]], [fence[0]], [fence[1]], [2_000])
+    assert mask.tolist() == [[True], [False]]
+
+
+def test_within_broadcasts_one_limit_per_fence():
+    fences = [(0.0, 0.0), (0.0, 0.01)]
+    point = (0.0, 0.005)  # about 556 m from each
+
+    mask = within(
+        point[0],
+        point[1],
+        [f[0] for f in fences],
+        [f[1] for f in fences],
+        [500, 600],
+    )
+
+    assert mask.tolist() == [[False, True]]
@@ -0,0 +1,151 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.models import AttendanceEvent, Location, LocationPing, User
+from app.utils.fence_index import Fence, fence_index
+from app.utils.geofence import (
+    FenceRoles,
+    Ping,
+    Transition,
+    evaluate_pings,
+    load_position,
+    positions,
+)
+
+START = datetime(2024, 1, 1, 9, tzinfo=UTC)
+NO_ROLES = FenceRoles(set(), set(), set(), set())
+
+# About 111 m per 0.001 degree of latitude
+INSIDE = 0.0
+EDGE = 0.00095  # ~106 m, inside a 100 m fence only when accuracy allows
+OUTSIDE = 0.002  # ~222 m
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    fence_index.rebuild([])
+    positions.clear()
+    yield
+    fence_index.rebuild([])
+    positions.clear()
+
+
+def pings(*points):
+    """Pings a minute apart, each point is (latitude, accuracy)"""
+    return [
+        Ping(latitude, 0.0, accuracy, START + timedelta(minutes=i))
+        for i, (latitude, accuracy) in enumerate(points)
+    ]
+
+
+def events(transitions):
+    return [(t.fence.kind, t.fence.id, t.event) for t in transitions]
+
+
+def test_enter_and_exit_once_despite_jitter():
+    fence_index.insert(Fence("location", 1, 0.0, 0.0, 100, owner_id=1))
+
+    transitions = evaluate_pings(
+        1,
+        NO_ROLES,
+        # Jitter across the boundary, still within the reported accuracy
+        pings((OUTSIDE, 0), (INSIDE, 20), (EDGE, 20), (INSIDE, 20), (OUTSIDE, 20)),
+    )
+
+    assert events(transitions) == [
+        ("location", 1, "enter"),
+        ("location", 1, "exit"),
+    ]
+    assert [t.timestamp for t in transitions] == [
+        START + timedelta(minutes=1),
+        START + timedelta(minutes=4),
+    ]
+
+
+def test_other_users_fences_are_ignored():
+    fence_index.insert(Fence("location", 1, 0.0, 0.0, 100, owner_id=2))
+
+    assert evaluate_pings(1, NO_ROLES, pings((INSIDE, 0))) == []
+
+
+def test_pings_older_than_the_position_are_dropped():
+    fence_index.insert(Fence("location", 1, 0.0, 0.0, 100, owner_id=1))
+    late, early = pings((OUTSIDE, 0), (INSIDE, 0))[::-1]
+
+    assert events(evaluate_pings(1, NO_ROLES, [late])) == [("location", 1, "enter")]
+    assert evaluate_pings(1, NO_ROLES, [early]) == []
+    assert positions[1].timestamp == late.timestamp
+
+
+async def create_user_at_location():
+    user = await User.create(
+        username="u", name="u", email="u@example.com", password="x", dob="2000-01-01"
+    )
+    location = await Location.create(latitude=0.0, longitude=0.0, user=user)
+    return user, location
+
+
+def enter(location, timestamp):
+    return Transition(fence_index.get(("location", location.id)), "enter", timestamp)
+
+
+async def log(user, ping, transitions):
+    # What the writers of the worker that served the ping would flush
+    await LocationPing.create(
+        user=user,
+        latitude=ping.latitude,
+        longitude=ping.longitude,
+        accuracy=ping.accuracy,
+        recorded_at=ping.timestamp,
+    )
+    for t in transitions:
+        await AttendanceEvent.create(
+            user=user,
+            fence_kind=t.fence.kind,
+            fence_id=t.fence.id,
+            event=t.event,
+            timestamp=t.timestamp,
+        )
+
+
+async def test_position_is_read_back_after_a_restart(db):
+    user, location = await create_user_at_location()
+    first, second = pings((INSIDE, 0), (INSIDE, 0))
+
+    transitions = evaluate_pings(user.id, NO_ROLES, [first])
+    assert events(transitions) == [("location", location.id, "enter")]
+    await log(user, first, transitions)
+
+    positions.clear()
+    position = await load_position(user.id, NO_ROLES)
+
+    assert list(position.inside) == [("location", location.id)]
+    assert evaluate_pings(user.id, NO_ROLES, [second]) == []
+
+
+async def test_position_is_read_back_when_another_worker_is_ahead(db):
+    user, location = await create_user_at_location()
+    outside, inside, still_inside = pings((OUTSIDE, 0), (INSIDE, 0), (INSIDE, 0))
+
+    # This worker saw the user outside
+    assert evaluate_pings(user.id, NO_ROLES, [outside]) == []
+    # Another worker saw them enter
+    await log(user, inside, [enter(location, inside.timestamp)])
+
+    await load_position(user.id, NO_ROLES)
+
+    assert positions[user.id].timestamp == inside.timestamp
+    assert evaluate_pings(user.id, NO_ROLES, [still_inside]) == []
+
+
+async def test_own_position_is_kept_when_the_log_is_behind(db):
+    user, location = await create_user_at_location()
+    first, second = pings((INSIDE, 0), (INSIDE, 0))
+    await log(user, first, [enter(location, first.timestamp)])
+
+    # Newer than the log, e.g. not flushed yet
+    evaluate_pings(user.id, NO_ROLES, [first, second])
+    position = positions[user.id]
+
+    assert await load_position(user.id, NO_ROLES) is position
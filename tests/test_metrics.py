@@ -0,0 +1,11 @@
+import httpx
+
+from app.main import app
+
+
+async def test_metrics_require_a_token():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/metrics/")
+
+    assert response.status_code == 403
@@ -0,0 +1,74 @@
+import json
+
+import httpx
+import pytest
+
+from app.config import config
+from app.main import app
+from app.models import User
+from app.utils.auth import get_current_user
+from app.utils.geofence import positions
+
+PING = {"latitude": 1.0, "longitude": 2.0, "accuracy": 5}
+
+
+@pytest.fixture
+async def client(db, monkeypatch):
+    user = await User.create(
+        username="u", name="u", email="u@example.com", password="x", dob="2000-01-01"
+    )
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: user)
+    monkeypatch.setattr(config, "ping_batch_max", 3)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    positions.clear()
+
+
+def ndjson(pings):
+    return "\n".join(json.dumps(ping) for ping in pings)
+
+
+async def test_batch_as_json_and_ndjson(client):
+    response = await client.post("/api/location/ping/batch", json=[PING, PING])
+    assert response.status_code == 200
+    assert response.json()["received"] == 2
+
+    response = await client.post(
+        "/api/location/ping/batch",
+        content=ndjson([PING] * 3),
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert response.json()["received"] == 3
+
+
+async def test_oversized_batches_are_refused_before_validation(client):
+    # Invalid points, so a 422 would mean they were validated first
+    invalid = {"latitude": 100}
+
+    response = await client.post("/api/location/ping/batch", json=[invalid] * 4)
+    assert response.status_code == 413
+
+    response = await client.post(
+        "/api/location/ping/batch",
+        content=ndjson([invalid] * 4),
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert response.status_code == 413
+
+    response = await client.post(
+        "/api/location/ping/batch", content=b" " * (3 * 512 + 1)
+    )
+    assert response.status_code == 413
+
+
+async def test_ndjson_errors_name_the_rejected_point(client):
+    response = await client.post(
+        "/api/location/ping/batch",
+        content=ndjson([PING, {**PING, "latitude": 100}, PING]),
+        headers={"content-type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 422
+    assert [error["loc"] for error in response.json()["detail"]] == [[1, "latitude"]]
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from app.utils.pubsub import Broker, PostgresBackplane
+
+
+class Server:
+    """Stands in for Postgres: NOTIFY reaches every listening connection"""
+
+    def __init__(self):
+        self.connections = []
+
+    def notify(self, channel: str, payload: str) -> None:
+        loop = asyncio.get_running_loop()
+        for connection in self.connections:
+            for callback in connection.listeners.get(channel, ()):
+                # asyncpg also calls listeners from the event loop, later
+                loop.call_soon(callback, connection, 0, channel, payload)
+
+
+class Connection:
+    def __init__(self, server: Server):
+        self.server = server
+        self.listeners = {}
+        self.closed = False
+        server.connections.append(self)
+
+    async def add_listener(self, channel, callback) -> None:
+        self.listeners.setdefault(channel, []).append(callback)
+
+    async def executemany(self, query, args) -> None:
+        assert query == "SELECT pg_notify($1, $2)"
+        if self.closed:
+            raise ConnectionError("connection is closed")
+        for channel, payload in args:
+            self.server.notify(channel, payload)
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    async def close(self) -> None:
+        self.closed = True
+        self.server.connections.remove(self)
+
+
+class LoopbackBackplane(PostgresBackplane):
+    reconnect_interval = 0.05
+
+    def __init__(self, server: Server):
+        super().__init__("postgresql://test", outbox_size=10)
+        self.server = server
+
+    async def _connect(self) -> None:
+        self._connection = Connection(self.server)
+        await self._connection.add_listener(self.channel, self._on_notify)
+
+
+@pytest.fixture
+async def brokers():
+    server = Server()
+    brokers = [Broker(10, LoopbackBackplane(server)) for _ in range(2)]
+    for broker in brokers:
+        await broker.start()
+    yield brokers
+    for broker in brokers:
+        await broker.stop()
+
+
+async def test_messages_reach_the_other_worker_once(brokers):
+    a, b = brokers
+    on_a, on_b = a.subscribe("t"), b.subscribe("t")
+
+    a.publish("t", {"n": 1})
+
+    assert await on_b.get(timeout=1) == {"n": 1}
+    assert await on_a.get(timeout=1) == {"n": 1}
+    # Worker A hears its own NOTIFY too, and skips it
+    assert await on_a.get(timeout=0.1) is None
+    assert await on_b.get(timeout=0.1) is None
+    assert a.backplane.stats()["sent"] == 1
+    assert a.backplane.stats()["received"] == 0
+    assert b.backplane.stats()["received"] == 1
+
+
+async def test_batches_keep_their_order(brokers):
+    a, b = brokers
+    on_b = b.subscribe("t")
+
+    for n in range(10):
+        a.publish("t", {"n": n})
+
+    assert [(await on_b.get(timeout=1))["n"] for _ in range(10)] == list(range(10))
+
+
+async def test_oversized_messages_stay_local(brokers):
+    a, b = brokers
+    on_a, on_b = a.subscribe("t"), b.subscribe("t")
+
+    a.publish("t", {"blob": "x" * PostgresBackplane.max_payload})
+
+    assert await on_a.get(timeout=1) is not None
+    assert await on_b.get(timeout=0.1) is None
+    assert a.backplane.stats()["dropped"] == 1
+    assert a.backplane.stats()["sent"] == 0
+
+
+async def test_a_dropped_connection_is_replaced(brokers):
+    a, b = brokers
+    on_a = a.subscribe("t")
+
+    await b.backplane._connection.close()
+    await asyncio.sleep(0.1)
+    b.publish("t", {"n": 1})
+
+    assert await on_a.get(timeout=1) == {"n": 1}
+    assert b.backplane.stats()["reconnects"] == 1
@@ -0,0 +1,22 @@
+from tortoise import Tortoise
+
+from app.query_plans import check
+
+
+async def test_route_queries_use_indexes(db, capsys):
+    # check() opens its own connections to DATABASE_URL
+    await Tortoise.close_connections()
+
+    failures = await check()
+
+    assert failures == 0, capsys.readouterr().out
+
+
+async def test_missing_index_fails_the_check(db, capsys):
+    await db.execute_script('DROP INDEX "idx_task_user_id_fb07ac"')
+    await Tortoise.close_connections()
+
+    assert await check() == 1
+    out = capsys.readouterr().out
+    assert "MISSING INDEX idx_task_user_id_fb07ac" in out
+    assert "SORT task.view:" in out
@@ -0,0 +1,111 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.models import Action, Location, User
+from app.utils import scheduler as scheduler_module
+from app.utils.action_index import action_index, claim_action, index_action
+from app.utils.fence_index import Fence
+from app.utils.geofence import UserPosition, positions
+from app.utils.scheduler import ActionScheduler
+from app.utils.triggers import TriggerRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = TriggerRegistry()
+    monkeypatch.setattr(scheduler_module, "triggers", registry)
+    fired = []
+
+    @registry.register("door", concurrency=1)
+    async def door(action):
+        fired.append(action.id)
+
+    registry.resolve()
+    yield registry, fired
+    positions.clear()
+    action_index.clear()
+
+
+async def open_action(trigger_function: str) -> Action:
+    user = await User.create(
+        username="u", name="u", email="u@example.com", password="x", dob="2000-01-01"
+    )
+    location = await Location.create(latitude=1.0, longitude=2.0, user=user)
+    now = datetime.now(UTC)
+    action = await Action.create(
+        trigger_function=trigger_function,
+        location=location,
+        user=user,
+        start_time=now - timedelta(minutes=1),
+        end_time=now + timedelta(hours=1),
+    )
+    index_action(action)
+    # The user is inside the action's location
+    fence = Fence("location", location.id, 1.0, 2.0, 100, owner_id=user.id)
+    positions[user.id] = UserPosition(1.0, 2.0, 0, now, {fence.key: fence})
+    return action
+
+
+async def run_jobs(scheduler: ActionScheduler) -> None:
+    worker = asyncio.create_task(scheduler._work())
+    await scheduler._jobs.join()
+    worker.cancel()
+    await asyncio.gather(worker, return_exceptions=True)
+
+
+async def test_actions_without_a_handler_are_left_for_the_client(db, registry):
+    scheduler = ActionScheduler(workers=1, queue_size=10)
+    action = await open_action("open_door")
+
+    await scheduler._check(action.id, datetime.now(UTC))
+
+    assert scheduler._jobs.empty()
+    assert not (await Action.get(id=action.id)).used
+    assert await claim_action(action.id, user_id=action.user_id)
+
+
+async def test_registered_actions_fire_once(db, registry):
+    _, fired = registry
+    scheduler = ActionScheduler(workers=1, queue_size=10)
+    action = await open_action("door")
+
+    await scheduler._check(action.id, datetime.now(UTC))
+    await scheduler._check(action.id, datetime.now(UTC))
+    await run_jobs(scheduler)
+    await asyncio.sleep(0)
+
+    assert fired == [action.id]
+    assert scheduler.stats()["dispatched"] == 1
+    assert (await Action.get(id=action.id)).used
+
+
+async def test_shed_claims_are_released(db, registry):
+    triggers, fired = registry
+    scheduler = ActionScheduler(workers=1, queue_size=10)
+    action = await open_action("door")
+
+    await scheduler._check(action.id, datetime.now(UTC))
+    # The handler fills up between the claim and the hand-off
+    triggers.get("door").max_pending = 0
+    await run_jobs(scheduler)
+
+    assert fired == []
+    assert scheduler.stats()["dispatched"] == 0
+    assert scheduler.stats()["released"] == 1
+    assert not (await Action.get(id=action.id)).used
+    assert action_index.get(action.id) is not None
+
+
+async def test_saturated_handlers_are_retried_without_claiming(db, registry):
+    triggers, _ = registry
+    scheduler = ActionScheduler(workers=1, queue_size=10)
+    action = await open_action("door")
+    triggers.get("door").max_pending = 0
+
+    await scheduler._check(action.id, datetime.now(UTC))
+
+    assert scheduler._jobs.empty()
+    assert scheduler.stats()["timers"] == 1
+    assert not (await Action.get(id=action.id)).used
@@ -0,0 +1,137 @@
+import asyncio
+import time
+from datetime import UTC, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.triggers import TriggerRegistry
+
+
+def actions(trigger_function: str, count: int):
+    # Handlers only read what they need, no rows required
+    return [
+        SimpleNamespace(id=i, user_id=1, trigger_function=trigger_function)
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+async def registry():
+    registry = TriggerRegistry()
+    yield registry
+    await registry.shutdown()
+
+
+async def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+
+async def test_slow_handler_does_not_block_fast_ones(registry, capsys):
+    release = asyncio.Event()
+    fast_done = []
+
+    @registry.register("slow", concurrency=4, timeout=30)
+    async def slow(action):
+        await release.wait()
+
+    @registry.register("fast", concurrency=16)
+    async def fast(action):
+        await asyncio.sleep(0.001)
+        fast_done.append(action.id)
+
+    registry.resolve()
+    now = datetime.now(UTC)
+    # The slow handler's queue fills first, the fast one's behind it
+    assert all(registry.submit(a, now) for a in actions("slow", 200))
+    started = time.perf_counter()
+    assert all(registry.submit(a, now) for a in actions("fast", 1000))
+
+    # Counted once the handler has returned, after it appended
+    await wait_until(lambda: registry.get("fast").stats()["succeeded"] == 1000)
+    elapsed = time.perf_counter() - started
+
+    slow_stats = registry.get("slow").stats()
+    assert slow_stats["pending"] == 200
+    assert slow_stats["succeeded"] == 0
+    assert sorted(fast_done) == list(range(1000))
+    with capsys.disabled():
+        print(
+            f"\n1000 fast actions in {elapsed:.2f} s ({1000 / elapsed:,.0f}/s)"
+            " behind 200 stuck slow ones"
+        )
+
+    release.set()
+    await wait_until(lambda: registry.get("slow").stats()["succeeded"] == 200)
+
+
+async def test_timeouts_are_retried_with_backoff(registry):
+    attempts = []
+    flaky_calls = []
+
+    @registry.register("hang", timeout=0.05, retries=2, backoff=0.01)
+    async def hang(action):
+        attempts.append(time.perf_counter())
+        await asyncio.sleep(10)
+
+    @registry.register("flaky", retries=2, backoff=0.01)
+    async def flaky(action):
+        flaky_calls.append(action.id)
+        if len(flaky_calls) == 1:
+            raise RuntimeError("first try fails")
+
+    registry.resolve()
+    now = datetime.now(UTC)
+    (hang_action,) = actions("hang", 1)
+    assert registry.submit(hang_action, now)
+    await wait_until(lambda: registry.get("hang").stats()["failed"] == 1)
+
+    stats = registry.get("hang").stats()
+    assert stats["timeouts"] == 3
+    assert stats["retried"] == 2
+    assert stats["pending"] == 0
+    # Backoff doubles: 0.01 s, then 0.02 s, on top of each 0.05 s timeout.
+    # Only lower bounds, a busy machine may add to either gap
+    assert attempts[1] - attempts[0] >= 0.06
+    assert attempts[2] - attempts[1] >= 0.07
+
+    (flaky_action,) = actions("flaky", 1)
+    assert registry.submit(flaky_action, now)
+    await wait_until(lambda: registry.get("flaky").stats()["succeeded"] == 1)
+
+    stats = registry.get("flaky").stats()
+    assert stats["retried"] == 1
+    assert stats["failed"] == 0
+    assert len(flaky_calls) == 2
+
+
+async def test_saturated_handler_sheds_new_work(registry):
+    release = asyncio.Event()
+
+    @registry.register("stuck", concurrency=1)
+    async def stuck(action):
+        await release.wait()
+
+    registry.resolve()
+    spec = registry.get("stuck")
+    now = datetime.now(UTC)
+
+    accepted = [registry.submit(a, now) for a in actions("stuck", 100)]
+
+    assert accepted.count(True) == spec.max_pending == 64
+    assert spec.stats()["rejected"] == 36
+    assert spec.saturated
+
+    release.set()
+    await wait_until(lambda: spec.stats()["succeeded"] == 64)
+    assert not spec.saturated
+    assert registry.submit(actions("stuck", 1)[0], now)
+
+
+async def test_unknown_handlers_are_refused(registry):
+    registry.resolve()
+
+    assert not registry.submit(actions("nothing", 1)[0], datetime.now(UTC))